@@ -0,0 +1,45 @@
+"""
+Run the extractor chain on a single voter box and print what it read.
+
+    python -m bench.inspect_box data/input.pdf 5 2 3 --save box.png
+
+PAGE is the 1-based PDF page, ROW (1-10) and COL (1-3) the grid cell. Pages
+come from the page cache (PAGE_CACHE_DIR) when it is enabled, so poking at
+boxes of the same roll again and again does not re-render it each time.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR one voter box of a roll PDF")
+    parser.add_argument("pdf")
+    parser.add_argument("page", type=int, help="1-based PDF page")
+    parser.add_argument("row", type=int, help="grid row, 1-10")
+    parser.add_argument("col", type=int, help="grid column, 1-3")
+    parser.add_argument("--dpi", type=int, help="override RASTER_DPI")
+    parser.add_argument("--save", help="write the cropped box image here")
+    args = parser.parse_args()
+
+    import cv2
+    from config import POPPLER_PATH, RASTER_DPI
+    from ocr.page_cache import get_page_cache
+    from ocr.page_cropper import crop_10x3_grid
+    from ocr.rasterizer import load_page
+    from scheduler import ocr_box
+
+    page = load_page(args.pdf, args.page, dpi=args.dpi or RASTER_DPI, poppler_path=POPPLER_PATH,
+                     page_cache=get_page_cache())
+    box = crop_10x3_grid(page)[(args.row - 1) * 3 + args.col - 1]
+    if args.save:
+        cv2.imwrite(args.save, box["image"])
+
+    print(json.dumps(ocr_box(box["image"]), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Throughput benchmark for the OCR pipeline on synthetic roll pages.
+
+    python -m bench.run_bench --pages 5 --out bench_output.json
+
+Every box goes through scheduler.ocr_box, the task the OCR workers run, and
+is timed per stage: rasterize, crop, remove_boxes and the extractor stages
+from the box's profile, and (with --db) the MySQL writer's add and flush. The report gives
+boxes/sec, p50/p95 per-box latency and peak RSS as JSON. The OCR result cache
+is switched off unless --cache is given, so repeated runs measure real work.
+
+    python -m bench.run_bench --pages 4 --sweep 16x1,8x2,4x4
+
+--sweep measures the worker split instead: for each OUTERxINNER pair the
+pages go through a BoxScheduler with OUTER worker processes and INNER
+Tesseract threads (OMP_THREAD_LIMIT), each in a fresh interpreter so the
+thread limit applies from the start, and the achieved boxes/sec is reported.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.synthetic import make_roll, save_roll_pdf  # noqa: E402
+
+
+# Stages of scheduler.ocr_box reported per box, read from the profile it returns
+# (full_ocr and parse_voter_info run inside perform_ocr, remove_boxes inside the
+# first extractor that reads the cleaned box)
+BOX_STAGES = ("ocr_box", "remove_boxes", "extract_seq", "perform_ocr", "extract_voterId_2", "full_ocr",
+              "parse_voter_info")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[index]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+
+
+def summarize(samples):
+    return {
+        "calls": len(samples),
+        "total_sec": round(sum(samples), 4),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2) if samples else None,
+        "p95_ms": round(percentile(samples, 95) * 1000, 2) if samples else None,
+    }
+
+
+def run(args):
+    import ocr.ocr_cache as ocr_cache
+    import ocr.engine_pool as engine_pool
+    from config import POPPLER_PATH
+    from ocr.rasterizer import rasterize_pages
+    from ocr.page_cropper import crop_10x3_grid, find_empty_cells
+    from scheduler import ocr_box
+
+    if not args.cache:
+        ocr_cache.OCR_CACHE_PATH = None
+    if args.engine:
+        engine_pool.OCR_ENGINE = args.engine
+
+    stages = {name: [] for name in ("rasterize", "crop") + BOX_STAGES + ("db_add", "db_flush")}
+    box_latency = []
+
+    pages = make_roll(args.pages, args.last_page_voters, seed=args.seed, dpi=args.dpi,
+                      hindi_font=args.font, latin_font=args.latin_font)
+
+    writer = None
+    if args.db:
+        from db_and_save import VoterDbWriter
+        from config import db_config
+        writer = VoterDbWriter(db_config)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = save_roll_pdf(pages, os.path.join(tmp, "synthetic_roll.pdf"), dpi=args.dpi)
+
+        run_start = time.perf_counter()
+        for page_num in range(3, 3 + args.pages):
+            start = time.perf_counter()
+            page_img = rasterize_pages(pdf_path, page_num, page_num, dpi=args.dpi, poppler_path=POPPLER_PATH)[0]
+            stages["rasterize"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            boxes = crop_10x3_grid(page_img)
+            empty = find_empty_cells(page_img)
+            stages["crop"].append(time.perf_counter() - start)
+
+            for index, (box, is_empty) in enumerate(zip(boxes, empty)):
+                if is_empty:
+                    break
+
+                # The worker task itself; its profile splits the time into stages,
+                # parse_voter_info timed on the text full_ocr read for this box
+                start = time.perf_counter()
+                box_result = ocr_box(box["image"], options={"profile": True})
+                box_latency.append(time.perf_counter() - start)
+                timings = (box_result.pop("profile") or {}).get("timings", {})
+                for name in BOX_STAGES:
+                    if name in timings:
+                        stages[name].append(timings[name][1])
+
+                if writer:
+                    start = time.perf_counter()
+                    writer.add(box_result["result"], (page_num - 3) * 30 + index + 1, box_result["sequenceOCR"],
+                               "bench_synthetic_roll")
+                    stages["db_add"].append(time.perf_counter() - start)
+
+            if writer:
+                start = time.perf_counter()
+                writer.flush(wait=True)
+                stages["db_flush"].append(time.perf_counter() - start)
+
+        wall = time.perf_counter() - run_start
+
+    if writer:
+        writer.close()
+
+    box_time = sum(box_latency)
+    return {
+        "pages": args.pages,
+        "boxes": len(box_latency),
+        "dpi": args.dpi,
+        "engine": engine_pool.engine_name(),
+        "python": platform.python_version(),
+        "wall_sec": round(wall, 3),
+        "boxes_per_sec": round(len(box_latency) / box_time, 3) if box_time else None,
+        "box_latency_p50_ms": round(percentile(box_latency, 50) * 1000, 2) if box_latency else None,
+        "box_latency_p95_ms": round(percentile(box_latency, 95) * 1000, 2) if box_latency else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": {name: summarize(samples) for name, samples in stages.items()},
+    }
+
+
+def parse_split(split):
+    outer, inner = split.lower().split("x")
+    return int(outer), int(inner)
+
+
+def run_split(args):
+    """
+    One worker split: every non-blank box of the synthetic roll through a
+    BoxScheduler with OUTER workers and INNER Tesseract threads.
+    """
+    import ocr.ocr_cache as ocr_cache
+    import ocr.engine_pool as engine_pool
+    from config import POPPLER_PATH
+    from ocr.rasterizer import rasterize_pages
+    from ocr.page_cropper import crop_10x3_grid, find_empty_cells
+    from scheduler import BoxScheduler
+
+    outer, inner = parse_split(args.split)
+    # Applied here and, through the pool initializer, in every worker
+    settings = {}
+    if not args.cache:
+        settings["ocr.ocr_cache"] = {"OCR_CACHE_PATH": None}
+        ocr_cache.OCR_CACHE_PATH = None
+    if args.engine:
+        settings["ocr.engine_pool"] = {"OCR_ENGINE": args.engine}
+        engine_pool.OCR_ENGINE = args.engine
+
+    pages = make_roll(args.pages, args.last_page_voters, seed=args.seed, dpi=args.dpi,
+                      hindi_font=args.font, latin_font=args.latin_font)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = save_roll_pdf(pages, os.path.join(tmp, "synthetic_roll.pdf"), dpi=args.dpi)
+        page_boxes = []
+        for page_num in range(3, 3 + args.pages):
+            page_img = rasterize_pages(pdf_path, page_num, page_num, dpi=args.dpi, poppler_path=POPPLER_PATH)[0]
+            boxes = crop_10x3_grid(page_img)
+            empty = find_empty_cells(page_img)
+            page_boxes.append(boxes[:int(empty.argmax())] if empty.any() else boxes)
+
+    with BoxScheduler(max_workers=outer, tesseract_threads=inner, worker_settings=settings) as scheduler:
+        # Warm-up: worker start and traineddata loading are not what is measured
+        scheduler.run_boxes([page_boxes[0][0]["image"]] * outer)
+
+        start = time.perf_counter()
+        for page_index, boxes in enumerate(page_boxes):
+            scheduler.submit_page(page_index, boxes)
+        done = sum(len(boxes) for _, boxes, _ in scheduler.completed_pages())
+        wall = time.perf_counter() - start
+
+    return {
+        "split": f"{outer}x{inner}",
+        "engine": engine_pool.engine_name(),
+        "workers": outer,
+        "tesseract_threads": inner,
+        "boxes": done,
+        "wall_sec": round(wall, 3),
+        "boxes_per_sec": round(done / wall, 3) if wall else None,
+    }
+
+
+def run_sweep(args):
+    """
+    Run every split of --sweep in its own interpreter and collect the results.
+    """
+    forwarded = ["--pages", str(args.pages), "--last-page-voters", str(args.last_page_voters),
+                 "--dpi", str(args.dpi), "--seed", str(args.seed)]
+    for flag, value in (("--font", args.font), ("--latin-font", args.latin_font), ("--engine", args.engine)):
+        if value:
+            forwarded += [flag, value]
+    if args.cache:
+        forwarded.append("--cache")
+
+    results = []
+    for split in args.sweep.split(","):
+        _, inner = parse_split(split)
+        env = dict(os.environ, OMP_THREAD_LIMIT=str(inner), OMP_NUM_THREADS=str(inner))
+        completed = subprocess.run(
+            [sys.executable, "-m", "bench.run_bench", "--split", split.strip()] + forwarded,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(f"[ERROR] Split {split} failed: {completed.stderr.strip()}")
+            continue
+        # The report is the last thing printed; engine warnings may come before it
+        result = json.loads(completed.stdout[completed.stdout.rfind("\n{") + 1:])
+        print(f"{result['split']:>6}: {result['boxes_per_sec']} boxes/s", file=sys.stderr)
+        results.append(result)
+
+    best = max(results, key=lambda result: result["boxes_per_sec"] or 0, default=None)
+    return {
+        "pages": args.pages,
+        "dpi": args.dpi,
+        "python": platform.python_version(),
+        "splits": results,
+        "best": best["split"] if best else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the OCR pipeline on synthetic roll pages")
+    parser.add_argument("--pages", type=int, default=3, help="voter pages to render")
+    parser.add_argument("--last-page-voters", type=int, default=20, help="filled cells on the last page")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=["auto", "tesserocr", "pytesseract"], help="override OCR_ENGINE")
+    parser.add_argument("--font", help="Devanagari TrueType font")
+    parser.add_argument("--latin-font", help="Latin TrueType font for IDs and digits")
+    parser.add_argument("--cache", action="store_true", help="keep the OCR result cache on")
+    parser.add_argument("--db", action="store_true", help="also time MySQL writes (uses config.db_config)")
+    parser.add_argument("--out", help="write the JSON report here as well")
+    parser.add_argument("--sweep", help="worker splits to compare, e.g. 16x1,8x2,4x4 (workers x Tesseract threads)")
+    parser.add_argument("--split", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.split:
+        report = run_split(args)
+    elif args.sweep:
+        report = run_sweep(args)
+    else:
+        report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Synthetic electoral-roll pages for benchmarking.
+
+Renders A4 pages with the 10x3 voter grid laid out where crop_10x3_grid and the
+field extractors expect it: serial number box, EPIC, name / relation / house /
+age-gender lines in Devanagari, and a photo box. Needs a TrueType font with
+Devanagari glyphs (Noto Sans Devanagari, Lohit, Mangal, Nirmala...); Pillow
+built with libraqm shapes the conjuncts and matras correctly.
+"""
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ocr.page_cropper import grid_geometry
+
+
+DEVANAGARI_FONTS = [
+    "/usr/share/fonts/truetype/noto/NotoSansDevanagari-Regular.ttf",
+    "/usr/share/fonts/opentype/noto/NotoSansDevanagari-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSansDevanagari-Regular.ttf",
+    "/usr/share/fonts/truetype/lohit-devanagari/Lohit-Devanagari.ttf",
+    "/usr/share/fonts/lohit-devanagari/Lohit-Devanagari.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+    r"C:\Windows\Fonts\Nirmala.ttf",
+    r"C:\Windows\Fonts\mangal.ttf",
+]
+
+LATIN_FONTS = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    r"C:\Windows\Fonts\arial.ttf",
+]
+
+FIRST_NAMES = ["राम", "सीता", "मोहन", "गीता", "सुरेश", "अनीता", "राजेश", "पूजा", "विकास", "सुनीता"]
+LAST_NAMES = ["कुमार", "देवी", "शर्मा", "वर्मा", "सिंह", "यादव", "गुप्ता", "चौहान"]
+RELATIONS = ["पिता", "पति"]
+GENDERS = ["पुरुष", "महिला"]
+
+A4_INCHES = (8.27, 11.69)
+
+
+def find_font(candidates, override=None):
+    for path in ([override] if override else []) + candidates:
+        if path and os.path.exists(path):
+            return path
+    raise FileNotFoundError(
+        "No suitable font found; pass one explicitly (tried: " + ", ".join(candidates) + ")"
+    )
+
+
+def _font(path, size):
+    try:
+        return ImageFont.truetype(path, size, layout_engine=ImageFont.Layout.RAQM)
+    except (ImportError, OSError, KeyError):
+        return ImageFont.truetype(path, size)
+
+
+def random_voter(rng, serial, prefix="IBG"):
+    return {
+        "serial": serial,
+        "voterId": f"{prefix}{rng.randint(0, 9999999):07d}",
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "relation": rng.choice(RELATIONS),
+        "relationName": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "houseNumber": str(rng.randint(1, 999)),
+        "Age": str(rng.randint(18, 95)),
+        "gender": rng.choice(GENDERS),
+    }
+
+
+def render_page(voters, dpi=300, hindi_font=None, latin_font=None):
+    """
+    Render one roll page holding `voters` (up to 30, filled row by row).
+    Returns an RGB PIL image; cells beyond len(voters) stay blank.
+    """
+    width, height = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+
+    top_offset, side_offset, box_h, box_w = grid_geometry(height, width)
+    hindi = _font(find_font(DEVANAGARI_FONTS, hindi_font), int(box_h * 0.085))
+    latin = _font(find_font(LATIN_FONTS, latin_font), int(box_h * 0.08))
+    line = max(2, dpi // 150)
+
+    for index, voter in enumerate(voters[:30]):
+        row, col = divmod(index, 3)
+        x0 = side_offset + col * box_w
+        y0 = top_offset + row * box_h
+
+        def at(fx, fy):
+            return x0 + int(fx * box_w), y0 + int(fy * box_h)
+
+        # Cell frame, serial number box and photo box
+        draw.rectangle([at(0.005, 0.01), at(0.995, 0.99)], outline="black", width=line)
+        draw.rectangle([at(0.21, 0.06), at(0.34, 0.22)], outline="black", width=line)
+        draw.text(at(0.235, 0.08), str(voter["serial"]), font=latin, fill="black")
+        draw.rectangle([at(0.72, 0.23), at(0.97, 0.93)], outline="black", width=line)
+        draw.text(at(0.78, 0.55), "Photo", font=latin, fill="gray")
+
+        # EPIC, top right
+        draw.text(at(0.62, 0.07), voter["voterId"], font=latin, fill="black")
+
+        # Text lines, in the bands the field extractors read
+        draw.text(at(0.03, 0.245), f"नाम : {voter['name']}", font=hindi, fill="black")
+        draw.text(at(0.03, 0.365), f"{voter['relation']} का नाम : {voter['relationName']}", font=hindi, fill="black")
+        draw.text(at(0.03, 0.485), "मकान संख्या :", font=hindi, fill="black")
+        draw.text(at(0.24, 0.49), voter["houseNumber"], font=latin, fill="black")
+        draw.text(at(0.03, 0.605), "आयु :", font=hindi, fill="black")
+        draw.text(at(0.125, 0.61), voter["Age"], font=latin, fill="black")
+        draw.text(at(0.3, 0.605), f"लिंग : {voter['gender']}", font=hindi, fill="black")
+
+    return page
+
+
+def make_roll(page_count, voters_on_last_page=20, seed=0, dpi=300, hindi_font=None, latin_font=None):
+    """
+    Build a synthetic roll: a list of (page_image, voters) for `page_count`
+    voter pages, the last one only partly filled.
+    """
+    rng = random.Random(seed)
+    pages = []
+    serial = 1
+    for page_index in range(page_count):
+        count = voters_on_last_page if page_index == page_count - 1 else 30
+        voters = []
+        for _ in range(count):
+            voters.append(random_voter(rng, serial))
+            serial += 1
+        pages.append((render_page(voters, dpi, hindi_font, latin_font), voters))
+    return pages
+
+
+def save_roll_pdf(pages, path, dpi=300):
+    """
+    Write pages as an image-only PDF in the real roll order: two cover pages,
+    the voter pages, and a closing page (process_pdf reads pages 3 .. N-1).
+    """
+    width, height = pages[0][0].size
+    blank = Image.new("RGB", (width, height), "white")
+    images = [blank, blank] + [page for page, _ in pages] + [blank]
+    images[0].save(path, "PDF", resolution=dpi, save_all=True, append_images=images[1:])
+    return path
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import (
+    CHECKPOINT_PATH, PIPELINE_VERSION, OCR_ENGINE, RASTER_DPI, RASTER_LOW_DPI, PAGE_OCR_MODE, TEXT_LAYER,
+    EMBEDDED_IMAGES, GLYPH_TEMPLATES,
+)
+
+
+def checkpoint_key(pdf_hash):
+    """
+    Key a PDF's checkpoints are stored under: its content hash plus
+    PIPELINE_VERSION and the settings that change what is extracted, so pages
+    finished by an older pipeline or under other settings are not reused.
+    """
+    settings = [PIPELINE_VERSION, OCR_ENGINE, RASTER_DPI, RASTER_LOW_DPI, PAGE_OCR_MODE, TEXT_LAYER,
+                EMBEDDED_IMAGES, GLYPH_TEMPLATES]
+    digest = hashlib.sha256(json.dumps(settings).encode('utf-8')).hexdigest()[:12]
+    return f"{pdf_hash}:{digest}"
+
+
+class CheckpointStore:
+    """
+    Durable record of finished pages, keyed by PDF content hash and page number.
+
+    Every finished page is committed together with its entries, so a run that
+    dies half way through a folder can skip what is already done and pick up in
+    the middle of the PDF it was working on.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                pdf_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                entries TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (pdf_hash, page_num)
+            );
+            CREATE TABLE IF NOT EXISTS pdfs (
+                pdf_hash TEXT PRIMARY KEY,
+                pdf_name TEXT,
+                page_count INTEGER,
+                entry_count INTEGER,
+                finished_at REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def completed_pages(self, pdf_hash):
+        """
+        {page_num: entries} for every page of this PDF already finished.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT page_num, entries FROM pages WHERE pdf_hash = ?", (pdf_hash,)
+            ).fetchall()
+        return {page_num: json.loads(entries) for page_num, entries in rows}
+
+    def save_page(self, pdf_hash, page_num, entries):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (pdf_hash, page_num, entries, finished_at) VALUES (?, ?, ?, ?)",
+                (pdf_hash, page_num, json.dumps(entries, ensure_ascii=False), time.time()),
+            )
+            self.conn.commit()
+
+    def is_pdf_done(self, pdf_hash):
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM pdfs WHERE pdf_hash = ?", (pdf_hash,)).fetchone()
+        return row is not None
+
+    def mark_pdf_done(self, pdf_hash, pdf_name, page_count, entry_count):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pdfs (pdf_hash, pdf_name, page_count, entry_count, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (pdf_hash, pdf_name, page_count, entry_count, time.time()),
+            )
+            self.conn.commit()
+
+    def forget_pdf(self, pdf_hash, pages=None):
+        """
+        Drop the PDF's checkpoints; with `pages`, only those pages' (the PDF
+        then no longer counts as done either).
+        """
+        with self.lock:
+            if pages is None:
+                self.conn.execute("DELETE FROM pages WHERE pdf_hash = ?", (pdf_hash,))
+            else:
+                self.conn.executemany(
+                    "DELETE FROM pages WHERE pdf_hash = ? AND page_num = ?", [(pdf_hash, page) for page in pages]
+                )
+            self.conn.execute("DELETE FROM pdfs WHERE pdf_hash = ?", (pdf_hash,))
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,4 +1,5 @@
 import os
+import multiprocessing
 from main4 import process_folder
 
 def run_cli_folder_ocr():
@@ -16,6 +17,10 @@ def run_cli_folder_ocr():
         print("⚠️ No PDF files found in the selected folder.")
         return
 
+    # Pages finished by an earlier run with the same pipeline and settings are reused
+    answer = input("♻️ Resume from earlier runs (reuse finished pages)? [Y/n]: ").strip().lower()
+    resume = answer not in ("n", "no")
+
     print(f"📄 Found {len(pdf_files)} PDF(s) in folder. Starting OCR...\n")
 
     # Initialize progress state
@@ -44,22 +49,25 @@ def run_cli_folder_ocr():
             folder_path,
             progress_callback=progress_callback,
             log_callback=log_callback,
-            pdf_progress_callback=pdf_progress_callback
+            pdf_progress_callback=pdf_progress_callback,
+            resume=resume,
         )
 
         print("\n🎉 All PDFs processed successfully.")
         print(f"📦 Total entries extracted: {len(entries)}")
 
-        # Optional: Save JSON
-        import json
-        json_output = os.path.join(folder_path, "output_combined.json")
-        with open(json_output, "w", encoding="utf-8") as f:
-            json.dump(entries, f, indent=2, ensure_ascii=False)
-        print(f"🧾 JSON saved to: {json_output}")
+        # Optional: Save JSON (streamed from the combined NDJSON, not held in memory)
+        if len(entries):
+            from result_writer import finalize_json
+            json_output = os.path.join(folder_path, "output_combined.json")
+            finalize_json(entries.path, json_output,
+                          sort_key=lambda e: (e["vidhansabha"], e["page"], e["row"], e["col"]))
+            print(f"🧾 JSON saved to: {json_output}")
         
 
     except Exception as e:
         print(f"\n❌ An error occurred during processing: {e}")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     run_cli_folder_ocr()
@@ -12,6 +12,85 @@ db_config = {
     'password': 'Cfs123**'
 }
 
+# Number of OCR worker processes. None = one per physical core.
+OCR_WORKERS = None
+
+# OCR engine: "auto" uses tesserocr (persistent in-process engines) when it is
+# installed and falls back to pytesseract; "tesserocr" / "pytesseract" force one.
+OCR_ENGINE = "auto"
+TESSDATA_PATH = None       # tessdata folder for tesserocr. None = its built-in default
+
+# Tesseract threading: OCR_WORKERS processes (outer) each run Tesseract with
+# TESSERACT_THREADS OpenMP threads (inner). Without a limit every call starts
+# one thread per core and the host drowns in context switches.
+TESSERACT_THREADS = 1          # OMP_THREAD_LIMIT per Tesseract call
+TESSERACT_CORE_BUDGET = None   # cores Tesseract may keep busy at once. None = physical cores
+
+# Age, house number and serial are printed in one fixed font: once every digit
+# has been seen in confident Tesseract reads, they are read by template matching
+# and Tesseract only runs when a glyph is not a clear match
+GLYPH_TEMPLATES = True
+GLYPH_MIN_SCORE = 0.9          # normalized cross-correlation a glyph needs with its best template
+GLYPH_MARGIN = 0.05            # ... and its lead over the best other digit
+GLYPH_HARVEST_CONF = 90        # Tesseract confidence a read needs to become a template
+GLYPH_TEMPLATES_PER_DIGIT = 8
+
+# "box": full_ocr runs on each of the 30 boxes. "page": the text of all boxes is
+# read with a single page-level OCR call and split back into cells.
+PAGE_OCR_MODE = "box"
+
+# Grid cells whose text area has less dark-pixel coverage than this are blank
+EMPTY_CELL_INK_RATIO = 0.005
+
+# OCR result cache keyed by ROI pixels + lang + config. None disables it.
+OCR_CACHE_PATH = "output/ocr_cache.sqlite"
+OCR_CACHE_MAX_MB = 1024
+
+# MySQL writer: rows per executemany/commit, pooled connections
+DB_BATCH_SIZE = 500
+DB_POOL_SIZE = 2
+
+# Results are streamed to output/<pdf>_result.ndjson as pages finish (fsynced at
+# most this often); WRITE_JSON_ARRAY also produces the legacy <pdf>_result.json
+NDJSON_FSYNC_SECONDS = 5
+WRITE_JSON_ARRAY = True
+
+# Finished pages are recorded here so an interrupted run can resume
+CHECKPOINT_PATH = "output/checkpoints.sqlite"
+# Part of every checkpoint key together with the settings that change results
+# (checkpoint.checkpoint_key): bump it when an OCR or parsing change should make
+# earlier checkpoints be read again instead of reused
+PIPELINE_VERSION = 1
+
+# Distributed mode (coordinator.py): worker hosts claim work from one SQLite
+# file on a shared filesystem and write their results next to it
+COORDINATOR_PATH = "output/coordinator.sqlite"
+SHARD_PAGES = None         # pages per work unit. None = one unit per PDF
+LEASE_SECONDS = 300        # a claim not renewed for this long is handed to another worker
+HEARTBEAT_SECONDS = 30     # how often a worker renews its claims
+CLAIM_BATCH = 2            # units a worker takes at once, so one unit's tail overlaps the next
+MAX_ATTEMPTS = 3           # a unit that failed this many times is left as "failed"
+
+# Page rasterization
+RASTER_DPI = 300
+RASTER_LOW_DPI = None      # e.g. 200: render and OCR at this DPI, re-render only failed boxes at RASTER_DPI
+RASTER_WINDOW = 2          # pages rendered per poppler call
+PAGES_IN_FLIGHT = None     # pages held in memory for OCR at once. None = sized to the worker count
+SHARED_MEMORY_PAGES = True # pages are handed to OCR workers through shared memory instead of pickled box images
+EMBEDDED_IMAGES = True     # pages that are one embedded JPEG scan are decoded directly, skipping poppler
+TEXT_LAYER = True          # pages with a Unicode text layer are parsed from it; only missing voter IDs are OCR'd
+
+# Rendered pages kept as raw .npy files and memory-mapped on reruns of the same
+# PDF at the same DPI (about 25 MB per page at 300 DPI). None disables it.
+PAGE_CACHE_DIR = None      # e.g. "output/page_cache"
+PAGE_CACHE_MAX_MB = 8192
+
+# Per-stage timing and Tesseract call counts, written per PDF as
+# PROFILE_DIR/<pdf>_profile.json and .csv. Off by default (main4.py --profile).
+PROFILE = False
+PROFILE_DIR = "output/profiles"
+PROFILE_LOG_EVERY = 5      # pages between live profile lines in the log
+
 #C:\Program Files\Tesseract-OCR
 
 #C:\Compilers\poppler-24.08.0\Library\bin
\ No newline at end of file
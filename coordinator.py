@@ -0,0 +1,471 @@
+"""
+Distributed batch mode: several worker hosts share one folder of roll PDFs.
+
+    python coordinator.py init data/rolls --shard-pages 20
+    python coordinator.py work            # on every worker host, as many times as wanted
+    python coordinator.py status
+    python coordinator.py merge           # once every unit is done
+
+The coordinator is a single SQLite file (COORDINATOR_PATH) on a filesystem all
+hosts can reach; there is no server. Workers claim work units (a PDF, or a
+range of its pages) under a lease, renew it from a heartbeat thread and hand
+it back when done. A worker that dies stops renewing, and once its lease runs
+out the unit goes back to the queue for someone else. Results are written next
+to the coordinator file, one NDJSON part per unit, and `merge` stitches them
+into the usual per-PDF and combined outputs. MySQL rows go to the same table
+from every worker (upserts keyed by roll and sequence).
+
+To try it on one machine, point several `work` processes at the same file.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import (
+    COORDINATOR_PATH, SHARD_PAGES, LEASE_SECONDS, HEARTBEAT_SECONDS, CLAIM_BATCH, MAX_ATTEMPTS,
+    OCR_WORKERS, WRITE_JSON_ARRAY,
+)
+
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Coordinator:
+    """
+    Work queue of (PDF, page range) units with leases, kept in a SQLite file.
+
+    Every state change runs in a BEGIN IMMEDIATE transaction, so claims from
+    any number of processes and hosts never hand the same unit out twice.
+    The rollback journal is used instead of WAL, which needs shared memory
+    that network filesystems do not provide.
+    """
+
+    def __init__(self, path=COORDINATOR_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=DELETE")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE TABLE IF NOT EXISTS units (
+                unit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                pdf_file TEXT NOT NULL,
+                first_page INTEGER NOT NULL,
+                last_page INTEGER NOT NULL,
+                pages INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                output_path TEXT,
+                entry_count INTEGER,
+                error TEXT,
+                finished_at REAL,
+                UNIQUE (pdf_file, first_page)
+            );
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL,
+                units_done INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+    @contextmanager
+    def _transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    @property
+    def parts_dir(self):
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), "parts")
+
+    def folder(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'folder'").fetchone()
+        return row["value"] if row else None
+
+    def add_folder(self, folder, shard_pages=SHARD_PAGES):
+        """
+        Queue every PDF of `folder`, split into units of `shard_pages` voter
+        pages (whole PDFs when None). Units already queued are left alone, so
+        adding the same folder again only picks up new PDFs.
+        Returns the number of units added.
+        """
+        from PyPDF2 import PdfReader
+
+        units = []
+        for pdf_file in sorted(f for f in os.listdir(folder) if f.lower().endswith(".pdf")):
+            # Voter pages are 3 .. N-1, as in PdfJob
+            last = len(PdfReader(os.path.join(folder, pdf_file)).pages) - 1
+            step = shard_pages or max(1, last - 2)
+            for first in range(3, last + 1, step):
+                end = min(last, first + step - 1)
+                units.append((pdf_file, first, end, end - first + 1))
+
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('folder', ?)", (os.path.abspath(folder),))
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO units (pdf_file, first_page, last_page, pages) VALUES (?, ?, ?, ?)", units
+            )
+            return conn.total_changes - before
+
+    def _reclaim(self, conn, now):
+        # Claims whose owner stopped renewing them: back to the queue, or given up
+        # on once they have been tried MAX_ATTEMPTS times
+        conn.execute(
+            "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "owner = NULL, lease_until = NULL, error = 'lease expired' "
+            "WHERE state = 'claimed' AND lease_until < ?",
+            (MAX_ATTEMPTS, now),
+        )
+
+    def claim(self, worker_id, count=1, lease_seconds=LEASE_SECONDS):
+        """
+        Take up to `count` pending units, largest first. Returns them as dicts.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._reclaim(conn, now)
+            rows = conn.execute(
+                "SELECT * FROM units WHERE state = 'pending' ORDER BY pages DESC, unit_id LIMIT ?", (count,)
+            ).fetchall()
+            units = []
+            for row in rows:
+                conn.execute(
+                    "UPDATE units SET state = 'claimed', owner = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE unit_id = ?",
+                    (worker_id, now + lease_seconds, row["unit_id"]),
+                )
+                unit = dict(row)
+                unit.update(state=CLAIMED, owner=worker_id, lease_until=now + lease_seconds, attempts=row["attempts"] + 1)
+                units.append(unit)
+            self._seen(conn, worker_id, now)
+        return units
+
+    def heartbeat(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        Renew every lease `worker_id` holds. Returns the number renewed.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            renewed = conn.execute(
+                "UPDATE units SET lease_until = ? WHERE state = 'claimed' AND owner = ?",
+                (now + lease_seconds, worker_id),
+            ).rowcount
+            self._seen(conn, worker_id, now)
+        return renewed
+
+    def complete(self, unit_id, worker_id, output_path, entry_count):
+        """
+        Record a finished unit. False when the lease was lost in the meantime
+        (another worker has the unit now and its result is the one kept).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE units SET state = 'done', output_path = ?, entry_count = ?, finished_at = ?, "
+                "lease_until = NULL, error = NULL WHERE unit_id = ? AND owner = ? AND state = 'claimed'",
+                (output_path, entry_count, now, unit_id, worker_id),
+            ).rowcount
+            if updated:
+                conn.execute("UPDATE workers SET units_done = units_done + 1 WHERE worker_id = ?", (worker_id,))
+            self._seen(conn, worker_id, now)
+        return bool(updated)
+
+    def fail(self, unit_id, worker_id, error):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_until = NULL, error = ? WHERE unit_id = ? AND owner = ? AND state = 'claimed'",
+                (MAX_ATTEMPTS, str(error), unit_id, worker_id),
+            )
+
+    def fail_all(self, worker_id, error):
+        """
+        fail() every unit `worker_id` still holds: the worker crashed with them,
+        and the attempt counts towards MAX_ATTEMPTS.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "owner = NULL, lease_until = NULL, error = ? WHERE owner = ? AND state = 'claimed'",
+                (MAX_ATTEMPTS, str(error), worker_id),
+            )
+
+    def release(self, worker_id):
+        """
+        Hand back every unit `worker_id` still holds (clean shutdown), without
+        counting it as an attempt.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE units SET state = 'pending', owner = NULL, lease_until = NULL, attempts = attempts - 1 "
+                "WHERE state = 'claimed' AND owner = ?",
+                (worker_id,),
+            )
+
+    def _seen(self, conn, worker_id, now):
+        conn.execute(
+            "INSERT INTO workers (worker_id, last_seen) VALUES (?, ?) "
+            "ON CONFLICT (worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+            (worker_id, now),
+        )
+
+    def counts(self):
+        """
+        {state: units} over the whole queue.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM units GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def units(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM units ORDER BY pdf_file, first_page").fetchall()
+        return [dict(row) for row in rows]
+
+    def workers(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM workers ORDER BY last_seen DESC").fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Renews a worker's leases every HEARTBEAT_SECONDS until stopped.
+    """
+
+    def __init__(self, coordinator, worker_id, interval=HEARTBEAT_SECONDS, lease_seconds=LEASE_SECONDS):
+        super().__init__(daemon=True, name="lease-keeper")
+        self.coordinator = coordinator
+        self.worker_id = worker_id
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.coordinator.heartbeat(self.worker_id, self.lease_seconds)
+            except sqlite3.Error as e:
+                # Keep trying: the lease only lapses after LEASE_SECONDS
+                print(f"[WARNING] Heartbeat failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def unit_label(unit):
+    return f"{unit['pdf_file']} pages {unit['first_page']}-{unit['last_page']}"
+
+
+def run_worker(coordinator_path=COORDINATOR_PATH, worker_id=None, folder=None, max_workers=OCR_WORKERS,
+               log_callback=print, resume=True, profile=None):
+    """
+    Claim and process units until the queue is empty. `folder` overrides the
+    folder recorded by `init`, for hosts that mount it elsewhere.
+    Returns the number of units this worker completed.
+    """
+    from pdf_job import PdfJob, run_jobs, make_scheduler
+
+    coordinator = Coordinator(coordinator_path)
+    worker_id = worker_id or default_worker_id()
+    folder = folder or coordinator.folder()
+    os.makedirs(coordinator.parts_dir, exist_ok=True)
+    completed = 0
+
+    def on_job_done(job):
+        nonlocal completed
+        unit = job.unit
+        if job.error is not None:
+            coordinator.fail(unit["unit_id"], worker_id, job.error)
+            log_callback(f"❌ {unit_label(unit)}: {job.error}")
+            return
+        entries, _ = job.result
+        # Only the file name: other hosts may mount the shared folder elsewhere
+        if coordinator.complete(unit["unit_id"], worker_id, os.path.basename(job.output_ndjson), len(entries)):
+            completed += 1
+            log_callback(f"✅ {unit_label(unit)}: {len(entries)} entries")
+        else:
+            log_callback(f"⚠️ {unit_label(unit)}: lease was lost, result left to the new owner")
+
+    keeper = LeaseKeeper(coordinator, worker_id)
+    keeper.start()
+    log_callback(f"🛠️ Worker {worker_id} on {coordinator_path}")
+    try:
+        # One pool for the worker's whole life, shared by every unit it claims
+        with make_scheduler(max_workers) as scheduler:
+            while True:
+                units = coordinator.claim(worker_id, CLAIM_BATCH)
+                if not units:
+                    counts = coordinator.counts()
+                    if not counts.get(PENDING) and not counts.get(CLAIMED):
+                        break
+                    # Everything left is claimed by others; wait in case a lease expires
+                    time.sleep(HEARTBEAT_SECONDS)
+                    continue
+
+                jobs = []
+                for unit in units:
+                    part = f"{os.path.splitext(unit['pdf_file'])[0]}_p{unit['first_page']}-{unit['last_page']}"
+                    try:
+                        job = PdfJob(
+                            pdf_path=os.path.join(folder, unit["pdf_file"]),
+                            log_callback=log_callback,
+                            is_folder_processing=True,
+                            resume=resume,
+                            profile=profile,
+                            collect_entries=False,
+                            pages=range(unit["first_page"], unit["last_page"] + 1),
+                            output_ndjson=os.path.join(coordinator.parts_dir, f"{part}.{worker_id}.ndjson"),
+                            write_json=False,
+                        )
+                    except Exception as e:
+                        coordinator.fail(unit["unit_id"], worker_id, e)
+                        log_callback(f"❌ {unit_label(unit)}: {e}")
+                        continue
+                    job.unit = unit
+                    jobs.append(job)
+
+                run_jobs(jobs, on_job_done=on_job_done, scheduler=scheduler)
+    except Exception as e:
+        # e.g. a broken process pool: a unit that keeps doing this must run out of attempts
+        coordinator.fail_all(worker_id, e)
+        raise
+    finally:
+        keeper.stop()
+        # Clean stop (normal exit or Ctrl-C): hand back what is left without charging an attempt
+        coordinator.release(worker_id)
+        coordinator.close()
+
+    log_callback(f"🏁 Worker {worker_id} done: {completed} unit(s)")
+    return completed
+
+
+def merge_results(coordinator_path=COORDINATOR_PATH, output_dir="output", log_callback=print):
+    """
+    Stitch the finished parts into output/<pdf>_result.ndjson (and .json) for
+    every PDF whose units are all done, plus combined_result.ndjson/.json, the
+    same files process_folder writes. PDFs with units still open are skipped.
+    """
+    from result_writer import NdjsonEntries, finalize_json
+
+    coordinator = Coordinator(coordinator_path)
+    units = coordinator.units()
+    parts_dir = coordinator.parts_dir
+    coordinator.close()
+
+    by_pdf = {}
+    for unit in units:
+        by_pdf.setdefault(unit["pdf_file"], []).append(unit)
+
+    os.makedirs(output_dir, exist_ok=True)
+    combined_ndjson = os.path.join(output_dir, "combined_result.ndjson")
+    total = 0
+    with open(combined_ndjson, "wb") as combined:
+        for pdf_file, pdf_units in sorted(by_pdf.items()):
+            done = [unit for unit in pdf_units if unit["state"] == DONE]
+            if len(done) < len(pdf_units):
+                log_callback(f"⏳ {pdf_file}: {len(done)}/{len(pdf_units)} unit(s) done, not merged")
+                continue
+
+            pdf_name = os.path.splitext(pdf_file)[0]
+            pdf_ndjson = os.path.join(output_dir, f"{pdf_name}_result.ndjson")
+            with open(pdf_ndjson, "wb") as target:
+                for unit in sorted(done, key=lambda unit: unit["first_page"]):
+                    part_path = os.path.join(parts_dir, os.path.basename(unit["output_path"]))
+                    with open(part_path, "rb") as part:
+                        shutil.copyfileobj(part, target)
+            with open(pdf_ndjson, "rb") as source:
+                shutil.copyfileobj(source, combined)
+            if WRITE_JSON_ARRAY:
+                finalize_json(pdf_ndjson, os.path.join(output_dir, f"{pdf_name}_result.json"),
+                              sort_key=lambda entry: (entry["page"], entry["row"], entry["col"]))
+            count = sum(unit["entry_count"] or 0 for unit in done)
+            total += count
+            log_callback(f"✅ {pdf_file}: {count} entries from {len(done)} unit(s)")
+
+    if WRITE_JSON_ARRAY:
+        finalize_json(combined_ndjson, os.path.join(output_dir, "combined_result.json"),
+                      sort_key=lambda entry: (entry["vidhansabha"], entry["page"], entry["row"], entry["col"]))
+    log_callback(f"📊 Total entries merged: {total}")
+    return NdjsonEntries(combined_ndjson, total)
+
+
+def print_status(coordinator_path=COORDINATOR_PATH):
+    coordinator = Coordinator(coordinator_path)
+    counts = coordinator.counts()
+    print(" | ".join(f"{state}: {counts.get(state, 0)}" for state in (PENDING, CLAIMED, DONE, FAILED)))
+    now = time.time()
+    for worker in coordinator.workers():
+        print(f"  {worker['worker_id']}: {worker['units_done']} unit(s) done, seen {now - worker['last_seen']:.0f}s ago")
+    for unit in coordinator.units():
+        if unit["state"] == FAILED:
+            print(f"  failed: {unit_label(unit)} ({unit['attempts']} attempt(s)): {unit['error']}")
+    coordinator.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+
+    parser = argparse.ArgumentParser(description="Distributed batch mode over a shared SQLite coordinator")
+    parser.add_argument("--db", default=COORDINATOR_PATH, help="coordinator file, on a filesystem every host can reach")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init = commands.add_parser("init", help="queue every PDF of a folder")
+    init.add_argument("folder")
+    init.add_argument("--shard-pages", type=int, default=SHARD_PAGES, help="pages per unit (default: whole PDFs)")
+
+    work = commands.add_parser("work", help="claim and process units until none are left")
+    work.add_argument("--folder", help="where this host sees the PDF folder, if not where init saw it")
+    work.add_argument("--workers", type=int, default=OCR_WORKERS, help="OCR processes on this host")
+    work.add_argument("--worker-id", help="default: <hostname>-<pid>")
+    work.add_argument("--no-resume", action="store_true")
+    work.add_argument("--profile", action="store_true")
+
+    commands.add_parser("status", help="show queue and worker state")
+
+    merge = commands.add_parser("merge", help="stitch finished units into the usual output files")
+    merge.add_argument("--output", default="output")
+
+    args = parser.parse_args()
+    if args.command == "init":
+        added = Coordinator(args.db).add_folder(args.folder, args.shard_pages)
+        print(f"📁 {added} unit(s) queued in {args.db}")
+    elif args.command == "work":
+        run_worker(args.db, worker_id=args.worker_id, folder=args.folder, max_workers=args.workers,
+                   resume=not args.no_resume, profile=True if args.profile else None)
+    elif args.command == "status":
+        print_status(args.db)
+    else:
+        merge_results(args.db, output_dir=args.output)
@@ -2,8 +2,15 @@ import os
 import cv2
 import re
 import mysql.connector
+from mysql.connector import pooling
 import unicodedata
 import sys
+import queue
+import atexit
+import threading
+import time
+from config import DB_BATCH_SIZE, DB_POOL_SIZE
+from ocr.profiling import record, count, active, using
 
 
 def ensure_utf8_environment():
@@ -83,14 +90,268 @@ def sanitize_filename_ascii_safe(filename):
         return 'entry'
 
 
-def save_entry_to_db_and_image(result, sequence, sequenceOCR, vidhansabha, image, db_config):
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS voter_entries (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    sequence INT ,
+    sequenceOCR VARCHAR(20),
+    voterId VARCHAR(100),
+    name TEXT,
+    relation TEXT,
+    relationName TEXT,
+    houseNumber TEXT,
+    age VARCHAR(10),
+    gender VARCHAR(20),
+    fileName VARCHAR(255),
+    UNIQUE KEY uq_file_sequence (fileName, sequence),
+    KEY idx_voterId (voterId)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+"""
+
+UPSERT_SQL = """
+INSERT INTO voter_entries (
+    sequence,sequenceOCR, voterId, name, relation, relationName, houseNumber, age, gender, fileName
+) VALUES (%s, %s,  %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE 
+    sequenceOCR=VALUES(sequenceOCR),
+    voterId=VALUES(voterId),
+    name=VALUES(name),
+    relation=VALUES(relation),
+    relationName=VALUES(relationName),
+    houseNumber=VALUES(houseNumber),
+    age=VALUES(age),
+    gender=VALUES(gender)
+"""
+
+
+def migrate_voter_entries(cursor):
     """
-    Save the OCR result to MySQL DB and image to disk, with proper encoding handling.
+    Bring an existing voter_entries table up to the current schema: a unique
+    (fileName, sequence) key so re-running a PDF updates its rows instead of
+    appending duplicates, and an index on voterId.
+    Safe to run on every start; it only touches what is missing.
     """
-    
-    # Ensure UTF-8 environment
-    ensure_utf8_environment()
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'voter_entries'
+    """)
+    indexes = {row[0] for row in cursor.fetchall()}
+
+    if 'uq_file_sequence' not in indexes:
+        # TEXT columns can't be part of a plain unique key
+        cursor.execute("""
+            SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'voter_entries' AND COLUMN_NAME = 'fileName'
+        """)
+        row = cursor.fetchone()
+        if row and row[0].lower() != 'varchar':
+            cursor.execute("ALTER TABLE voter_entries MODIFY fileName VARCHAR(255)")
+
+        # Drop duplicates left by earlier re-runs, keeping the newest row
+        cursor.execute("""
+            DELETE older FROM voter_entries older
+            JOIN voter_entries newer
+              ON older.fileName = newer.fileName
+             AND older.sequence = newer.sequence
+             AND older.id < newer.id
+        """)
+        if cursor.rowcount:
+            print(f"[INFO] Removed {cursor.rowcount} duplicate voter_entries rows")
+
+        cursor.execute("ALTER TABLE voter_entries ADD UNIQUE KEY uq_file_sequence (fileName, sequence)")
+
+    if 'idx_voterId' not in indexes:
+        cursor.execute("ALTER TABLE voter_entries ADD KEY idx_voterId (voterId)")
+
+
+def ensure_utf8_string(value):
+    """
+    Ensure all data is properly encoded as UTF-8 strings
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def voter_row(result, sequence, sequenceOCR, vidhansabha):
+    """
+    Build the voter_entries row for one OCR result, in UPSERT_SQL column order.
+    """
+    return (
+        sequence,
+        sequenceOCR,
+        ensure_utf8_string(result.get("voterId", "")),
+        ensure_utf8_string(result.get("name", "")),
+        ensure_utf8_string(result.get("relation", "")),
+        ensure_utf8_string(result.get("relationName", "")),
+        ensure_utf8_string(result.get("houseNumber", "")),
+        ensure_utf8_string(result.get("Age", "")),
+        ensure_utf8_string(result.get("gender", "")),
+        ensure_utf8_string(vidhansabha),
+    )
+
+
+class VoterDbWriter:
+    """
+    Writes voter rows to MySQL from a background thread.
+
+    Rows are queued without blocking the caller and written with executemany in
+    batches of `batch_size`, one commit per batch. flush() writes whatever is
+    queued right away (call it when a page or PDF is finished).
+    Each row carries the profile that was active when it was queued, and the
+    batch timings are recorded there (the writer thread has none of its own).
+    """
+
+    def __init__(self, db_config, batch_size=500, pool_size=2):
+        self.batch_size = max(1, batch_size)
+        self.pool = None
+        self.rows = queue.Queue()
+        self._closed = False
+
+        # Ensure UTF-8 environment
+        ensure_utf8_environment()
+
+        try:
+            # Every pooled connection is opened with utf8mb4 once, instead of
+            # re-running SET NAMES for each row
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"voter_db_{id(self)}",
+                pool_size=max(1, pool_size),
+                host=db_config["host"],
+                user=db_config["user"],
+                password=db_config["password"],
+                database=db_config["database"],
+                charset="utf8mb4",
+                collation="utf8mb4_unicode_ci",
+                use_unicode=True,
+                autocommit=False
+            )
+            self._ensure_schema()
+        except mysql.connector.Error as err:
+            print(f"[MYSQL ERROR] {err}")
+            print("[WARNING] Database writes disabled for this run")
+            self.pool = None
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _ensure_schema(self):
+        conn = self.pool.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(CREATE_TABLE_SQL)
+            migrate_voter_entries(cursor)
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
 
+    def add(self, result, sequence, sequenceOCR, vidhansabha):
+        if self.pool is None or self._closed:
+            return
+        self.rows.put((active(), voter_row(result, sequence, sequenceOCR, vidhansabha)))
+
+    def flush(self, wait=False):
+        """
+        Write all queued rows now. With wait=True, block until they are committed.
+        """
+        if self._closed:
+            return
+        done = threading.Event()
+        self.rows.put(done)
+        if wait:
+            done.wait()
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush(wait=True)
+        self._closed = True
+        self.rows.put(None)
+        self.thread.join()
+
+    def _run(self):
+        batch = []
+        while True:
+            item = self.rows.get()
+            if item is None:
+                break
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch = []
+                item.set()
+                continue
+
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+
+    def _write(self, batch):
+        if not batch or self.pool is None:
+            return
+        conn = None
+        start = time.perf_counter()
+        try:
+            conn = self.pool.get_connection()
+            cursor = conn.cursor()
+            cursor.executemany(UPSERT_SQL, [row for _, row in batch])
+            conn.commit()
+            cursor.close()
+            elapsed = time.perf_counter() - start
+
+            # Every profile with rows in this batch waited for all of it
+            rows_per_profile = {}
+            for profile, _ in batch:
+                if profile is not None:
+                    rows_per_profile[profile] = rows_per_profile.get(profile, 0) + 1
+            for profile, rows in rows_per_profile.items():
+                with using(profile):
+                    record("db_write_batch", elapsed)
+                    count("db_rows", rows)
+        except mysql.connector.Error as err:
+            print(f"[MYSQL ERROR] {err} ({len(batch)} rows not saved)")
+            if conn is not None:
+                conn.rollback()
+        except Exception as e:
+            print(f"[ERROR] Unexpected database error: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_db_writer(db_config):
+    """
+    Shared VoterDbWriter per database, created on first use.
+    """
+    key = tuple(sorted(db_config.items()))
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = VoterDbWriter(db_config, batch_size=DB_BATCH_SIZE, pool_size=DB_POOL_SIZE)
+        return writer
+
+
+@atexit.register
+def close_db_writers():
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def save_entry_to_db_and_image(result, sequence, sequenceOCR, vidhansabha, image, db_config):
+    """
+    Queue the OCR result for the MySQL writer and save the image to disk.
+    Rows are written in batches; call get_db_writer(db_config).flush() to push them out.
+    """
 
     # //Uncomment this if you want to save the image
     # # Create ASCII-safe filename
@@ -112,100 +373,7 @@ def save_entry_to_db_and_image(result, sequence, sequenceOCR, vidhansabha, image
     # except Exception as e:
     #     print(f"[ERROR] Failed to save image: {e}")
 
-    # Save to MySQL with proper encoding
-    try:
-        # Connect with explicit encoding settings
-        conn = mysql.connector.connect(
-            host=db_config["host"],
-            user=db_config["user"],
-            password=db_config["password"],
-            database=db_config["database"],
-            charset="utf8mb4",
-            use_unicode=True,
-            autocommit=False
-        )
-        
-        cursor = conn.cursor(buffered=True)
-        
-        # Force UTF-8 settings
-        cursor.execute("SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci;")
-        cursor.execute("SET CHARACTER SET utf8mb4;")
-        cursor.execute("SET character_set_connection=utf8mb4;")
-        cursor.execute("SET character_set_results=utf8mb4;")
-        cursor.execute("SET character_set_client=utf8mb4;")
-
-        # Create table if not exists with explicit UTF-8 settings
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS voter_entries (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            sequence INT ,
-            sequenceOCR VARCHAR(20),
-            voterId VARCHAR(100),
-            name TEXT,
-            relation TEXT,
-            relationName TEXT,
-            houseNumber TEXT,
-            age VARCHAR(10),
-            gender VARCHAR(20),
-            fileName TEXT
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
-        """)
-
-        # Ensure all data is properly encoded as UTF-8 strings
-        def ensure_utf8_string(value):
-            if value is None:
-                return ""
-            if isinstance(value, bytes):
-                return value.decode('utf-8', errors='replace')
-            return str(value)
-
-        # Prepare data with explicit UTF-8 encoding
-        voter_data = (
-            sequence,
-            sequenceOCR,
-            ensure_utf8_string(result.get("voterId", "")),
-            ensure_utf8_string(result.get("name", "")),
-            ensure_utf8_string(result.get("relation", "")),
-            ensure_utf8_string(result.get("relationName", "")),
-            ensure_utf8_string(result.get("houseNumber", "")),
-            ensure_utf8_string(result.get("Age", "")),
-            ensure_utf8_string(result.get("gender", "")),
-            ensure_utf8_string(vidhansabha),
-        )
-
-        # Insert or update entry
-        insert_query = """
-        INSERT INTO voter_entries (
-            sequence,sequenceOCR, voterId, name, relation, relationName, houseNumber, age, gender, fileName
-        ) VALUES (%s, %s,  %s, %s, %s, %s, %s, %s, %s, %s)
-        ON DUPLICATE KEY UPDATE 
-            sequence=VALUES(sequence),
-            sequenceOCR=VALUES(sequenceOCR),
-            voterId=VALUES(voterId),
-            name=VALUES(name),
-            relation=VALUES(relation),
-            relationName=VALUES(relationName),
-            houseNumber=VALUES(houseNumber),
-            age=VALUES(age),
-            gender=VALUES(gender)
-        """
-        
-        cursor.execute(insert_query, voter_data)
-        conn.commit()
-        
-        
-        # Verify the insert by reading it back
-        cursor.execute("SELECT name, relationName, fileName FROM voter_entries WHERE sequence = %s", (sequence,))
-        result_row = cursor.fetchone()
-        
-
-        cursor.close()
-        conn.close()
-
-    except mysql.connector.Error as err:
-        print(f"[MYSQL ERROR] {err}")
-    except Exception as e:
-        print(f"[ERROR] Unexpected database error: {e}")
+    get_db_writer(db_config).add(result, sequence, sequenceOCR, vidhansabha)
 
 
 def debug_encoding_info():
@@ -259,7 +427,9 @@ def fix_database_encoding(db_config):
             houseNumber TEXT,
             age VARCHAR(10),
             gender VARCHAR(20),
-            fileName TEXT
+            fileName VARCHAR(255),
+            UNIQUE KEY uq_file_sequence (fileName, sequence),
+            KEY idx_voterId (voterId)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """)
         
@@ -1,4 +1,6 @@
 import threading
+import multiprocessing
+import itertools
 import json
 import os
 import ttkbootstrap as ttk
@@ -7,6 +9,9 @@ from tkinter import filedialog, scrolledtext, messagebox
 from tkinter import ttk as tkttk  # For PanedWindow
 from main4 import process_pdf, process_folder
 
+# Entries shown in the JSON preview pane
+PREVIEW_LIMIT = 1000
+
 
 class OCRApp:
     def __init__(self, root):
@@ -44,6 +49,10 @@ class OCRApp:
         self.start_btn = ttk.Button(top_frame, text="▶️ Start OCR", state=DISABLED, bootstyle="success", command=self.start_ocr)
         self.start_btn.pack(side="left", padx=10)
 
+        # Reuse pages finished by an earlier run (same PDF, pipeline and settings)
+        self.resume_var = ttk.BooleanVar(value=True)
+        ttk.Checkbutton(top_frame, text="♻️ Resume", variable=self.resume_var, bootstyle="round-toggle").pack(side="left", padx=5)
+
         # Status label
         self.status_label = ttk.Label(top_frame, text="", font=("Segoe UI", 10, "bold"))
         self.status_label.pack(side="right")
@@ -123,7 +132,8 @@ class OCRApp:
                     self.selected_path,
                     progress_callback=self.update_folder_progress,
                     log_callback=self.log,
-                    pdf_progress_callback=self.create_pdf_progress
+                    pdf_progress_callback=self.create_pdf_progress,
+                    resume=self.resume_var.get()
                 )
             else:
                 # Process single PDF - show one progress bar per page
@@ -138,12 +148,17 @@ class OCRApp:
                 entries, _ = process_pdf(
                     self.selected_path,
                     progress_callback=self.update_single_pdf_progress,
-                    log_callback=self.log
+                    log_callback=self.log,
+                    resume=self.resume_var.get()
                 )
 
-            # Display results in JSON preview
+            # Display results in JSON preview. Folder results are streamed from
+            # disk, so only the first PREVIEW_LIMIT entries are loaded for display
+            preview = list(itertools.islice(entries, PREVIEW_LIMIT))
             self.json_text.delete("1.0", "end")
-            self.json_text.insert("end", json.dumps(entries, indent=2, ensure_ascii=False))
+            self.json_text.insert("end", json.dumps(preview, indent=2, ensure_ascii=False))
+            if len(entries) > PREVIEW_LIMIT:
+                self.json_text.insert("end", f"\n\n... {len(entries) - PREVIEW_LIMIT} more entries in the output folder")
 
             self.status_label.config(text="✅ OCR Complete", foreground="green")
             self.log("✅ OCR Completed Successfully")
@@ -235,6 +250,7 @@ class OCRApp:
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     root = ttk.Window(themename="flatly")  # morph/superhero/cyborg/lux/litera
     app = OCRApp(root)
     root.mainloop()
\ No newline at end of file
@@ -1,15 +1,14 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
 import os
-import json
-from db_and_save import save_entry_to_db_and_image
+import multiprocessing
 
 
-def process_folder(folder_path, progress_callback=None, log_callback=None, pdf_progress_callback=None):
+def process_folder(folder_path, progress_callback=None, log_callback=None, pdf_progress_callback=None, resume=True, profile=None):
     import os
     import time
-    from PyPDF2 import PdfReader
-
+    from config import WRITE_JSON_ARRAY, PROFILE, PROFILE_DIR
+    from result_writer import NdjsonWriter, NdjsonEntries, finalize_json
+    from pdf_job import PdfJob, run_jobs
+    from ocr import profiling
 
 
     # Detect PDF files
@@ -32,7 +31,11 @@ def process_folder(folder_path, progress_callback=None, log_callback=None, pdf_p
     total_start_time = time.time()
 
     pdf_files.sort()
-    all_entries = []
+
+    # Every PDF's entries are appended here as its pages finish, so memory stays
+    # flat however many PDFs the folder holds
+    output_ndjson = "output/combined_result.ndjson"
+    combined_writer = NdjsonWriter(output_ndjson)
 
     if log_callback:
         log_callback(f"📁 Found {len(pdf_files)} PDF files to process")
@@ -43,50 +46,78 @@ def process_folder(folder_path, progress_callback=None, log_callback=None, pdf_p
         for pdf_path in pdf_files:
             pdf_progress_callback(os.path.basename(pdf_path))
 
-    for pdf_index, pdf_path in enumerate(pdf_files):
-        pdf_name = os.path.basename(pdf_path)
-        current_pdf_num = pdf_index + 1
-
-        if log_callback:
-            log_callback(f"\n📄 Processing PDF {current_pdf_num}/{len(pdf_files)}: {pdf_name}")
+    def pdf_specific_progress_callback(job):
+        pdf_name = os.path.basename(job.pdf_path)
+        total_pages = len(job.reader.pages) - 3
+        pages_processed = 0
 
-        try:
-            reader = PdfReader(pdf_path)
-            total_pages = len(reader.pages) - 3
-
-            pages_processed = 0
+        def callback(gd, gt, pi, lb, tb):
+            nonlocal pages_processed
+            if lb == tb and lb == 30:
+                pages_processed += 1
+            if progress_callback:
+                progress_callback(job.number, len(pdf_files), pdf_name, pages_processed, total_pages)
 
-            def pdf_specific_progress_callback(gd, gt, pi, lb, tb):
-                nonlocal pages_processed
-                if lb == tb and lb == 30:
-                    pages_processed += 1
-                if progress_callback:
-                    progress_callback(current_pdf_num, len(pdf_files), pdf_name, pages_processed, total_pages)
+        return callback
 
-            entries, _ = process_pdf(
+    # Every PDF becomes a job on one shared worker pool; they run longest first,
+    # but keep their number in filename order for the logs and progress bars
+    if profile is None:
+        profile = PROFILE
+    folder_profile = profiling.Profile() if profile else None
+    jobs = []
+    for pdf_index, pdf_path in enumerate(pdf_files):
+        pdf_name = os.path.basename(pdf_path)
+        try:
+            job = PdfJob(
                 pdf_path=pdf_path,
-                progress_callback=pdf_specific_progress_callback,
                 log_callback=log_callback,
-                is_folder_processing=True
+                is_folder_processing=True,
+                resume=resume,
+                profile=profile,
+                collect_entries=False,
+                combined_writer=combined_writer
             )
-
-            if progress_callback:
-                progress_callback(current_pdf_num, len(pdf_files), pdf_name, total_pages, total_pages)
-
-            all_entries.extend(entries)
-
-            if log_callback:
-                log_callback(f"✅ Completed {pdf_name}: {len(entries)} entries extracted")
-
         except Exception as e:
             if log_callback:
                 log_callback(f"❌ Error processing {pdf_name}: {str(e)}")
             continue
+        job.number = pdf_index + 1
+        job.progress_callback = pdf_specific_progress_callback(job)
+        jobs.append(job)
+
+    def on_job_start(job):
+        if log_callback:
+            log_callback(f"\n📄 Processing PDF {job.number}/{len(pdf_files)}: {os.path.basename(job.pdf_path)}")
+
+    def on_job_done(job):
+        pdf_name = os.path.basename(job.pdf_path)
+        if job.error is not None:
+            if log_callback:
+                log_callback(f"❌ Error processing {pdf_name}: {str(job.error)}")
+            return
+
+        entries, _ = job.result
+        total_pages = len(job.reader.pages) - 3
+        if progress_callback:
+            progress_callback(job.number, len(pdf_files), pdf_name, total_pages, total_pages)
+        if log_callback:
+            log_callback(f"✅ Completed {pdf_name}: {len(entries)} entries extracted")
+        if folder_profile is not None:
+            folder_profile.merge(job.profile.snapshot())
+
+    run_jobs(jobs, on_job_start=on_job_start, on_job_done=on_job_done)
+
+    combined_writer.close()
+    all_entries = NdjsonEntries(output_ndjson, combined_writer.count)
 
     output_json = "output/combined_result.json"
-    os.makedirs("output", exist_ok=True)
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(all_entries, f, ensure_ascii=False, indent=2)
+    if WRITE_JSON_ARRAY:
+        # PDFs share one queue, so their pages land interleaved: put them back PDF by PDF
+        finalize_json(output_ndjson, output_json,
+                      sort_key=lambda e: (e["vidhansabha"], e["page"], e["row"], e["col"]))
+    else:
+        output_json = output_ndjson
 
     
     total_end_time = time.time()
@@ -98,162 +129,62 @@ def process_folder(folder_path, progress_callback=None, log_callback=None, pdf_p
         log_callback(f"📊 Total entries extracted: {len(all_entries)}")
         log_callback(f"⏱️ Total execution time: {total_execution_time_minutes:.0f} Minutes {total_execution_time_secs:.2f} seconds")
 
+    if folder_profile is not None:
+        json_path, csv_path = folder_profile.write(os.path.join(PROFILE_DIR, "combined_profile"))
+        if log_callback:
+            log_callback(f"📈 All PDFs: {folder_profile.live_summary()}")
+            log_callback(f"📈 Profile saved to {json_path} and {csv_path}")
 
 
     return all_entries
 
 
-def process_pdf(pdf_path="data/input.pdf", progress_callback=None, log_callback=None, is_folder_processing=False):
-    import time
-    import cv2
-    import numpy as np
-    from PIL import Image
-    from PyPDF2 import PdfReader
-    from pdf2image import convert_from_path
-    from config import POPPLER_PATH
-    from ocr.preprocessing import preprocess_image, remove_boxes
-    from ocr.extract_fields import extract_fields
-    from ocr.page_cropper import crop_10x3_grid
-    from ocr.ocr_engine_2  import (perform_ocr,extract_seq)
-    from ocr.ocr_vidhansabha import extract_text
-
-
-    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
-    if log_callback:
-        log_callback(f"📄 Processing PDF: {pdf_name}")
-    output_json = f"output/{pdf_name}_result.json"
-    os.makedirs("temp_crops", exist_ok=True)
-    start_time = time.time()
-    offset = 0
-    reader = PdfReader(pdf_path)
-
-    
-
-    # # Extract Vidhan Sabha Info
-    # firstPage = convert_from_path(pdf_path, dpi=300, first_page=1, last_page=1, poppler_path=POPPLER_PATH)
-    # firstPageImg = cv2.cvtColor(np.array(firstPage[0]), cv2.COLOR_RGB2BGR)
-    # h, w = firstPageImg.shape[:2]
-    # image = firstPageImg[int(0.085 * h):int(0.11 * h), int(0.384 * w):int(0.98 * w)]
-    # os.makedirs("output/first_pages", exist_ok=True)
-    # cv2.imwrite(f"output/first_pages/{pdf_name}_firstpage.jpg", image)
-
-    # vidhansabha = extract_text(image)
-    # if log_callback:
-    #     log_callback(f"📍 Extracted Vidhan Sabha Info: {vidhansabha}")
-
-    images = convert_from_path(pdf_path, dpi=300, first_page=3, last_page=len(reader.pages) - 1, poppler_path=POPPLER_PATH)
-
-    total_expected_entries = len(images) * 30
-    all_entries = []
-    entry_count = 0
-    lock = threading.Lock()
-
-    db_config = {
-        "host": "localhost",
-        "user": "root",
-        "password": "Password@123",
-        "database": "voter_db",
-    }
-
-    def process_single_page(page_index, page_img):
-        import pytesseract
-        should_break = False
-        nonlocal entry_count
-        page_num = page_index + 3
-        entries = []
-        nonlocal offset
-        if log_callback and not is_folder_processing:
-            log_callback(f"📄 Page {page_num}: Started")
-
-        img_cv2 = cv2.cvtColor(np.array(page_img), cv2.COLOR_RGB2BGR)
-        boxes = crop_10x3_grid(img_cv2)
-
-        for i, box in enumerate(boxes):
-            if should_break:
-                if log_callback and not is_folder_processing:
-                    log_callback(f"❌ Stopping early on page {page_num} due to empty fields.")
-                break
-            sequenceOCR = extract_seq(box["image"])
-    
-    
-            img_no_border = remove_boxes(box["image"])
-            result = perform_ocr(img_no_border)
-
-            required_fields = ['Name', 'relation', 'relationName', 'houseNumber', 'Age']
-            is_empty = all(not result.get(field) for field in required_fields)
-
-            # Handle skipping and early stop based on empty fields
-            if is_empty:
-                    should_break = True
-                    break
-                
-            with lock:
-                entry_count += 1
-                if progress_callback:
-                    progress_callback(entry_count, total_expected_entries, page_index, i + 1, 30)
-
-            sequence = (page_num - 3) * 30 + (box["row"] - 1) * 3 + box["col"] - offset
-
-            save_entry_to_db_and_image(
-                result=result,
-                vidhansabha=pdf_name,
-                sequence=sequence,
-                sequenceOCR=sequenceOCR,
-                image=box["image"],
-                db_config=db_config,
-            )
-
-            entries.append({
-                "sequence": sequence,
-                "sequenceOCR": sequenceOCR,
-                "page": page_num,
-                "row": box["row"],
-                "col": box["col"],
-                "vidhansabha": pdf_name,
-                "text": result,
-            })
-
-
-        if log_callback and not is_folder_processing:
-            log_callback(f"✅ Page {page_num}: Done ({len(entries)} entries)")
+def process_pdf(pdf_path="data/input.pdf", progress_callback=None, log_callback=None, is_folder_processing=False, resume=True, profile=None,
+                collect_entries=True, combined_writer=None):
+    from pdf_job import PdfJob, run_jobs
 
-        return entries
-
-    with ThreadPoolExecutor(max_workers=16) as executor:
-        futures = [executor.submit(process_single_page, i, img) for i, img in enumerate(images)]
-        for f in as_completed(futures):
-            result = f.result()
-            all_entries.extend(result)
-
-    os.makedirs("output", exist_ok=True)
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(all_entries, f, ensure_ascii=False, indent=2)
-
-    end_time = time.time()
-    if log_callback:
-        log_callback(f"💾 JSON saved to {output_json}")
-        log_callback(f"⏱️ Execution Time: {end_time - start_time:.2f} sec")
-        log_callback(f"📊 Total entries extracted: {len(all_entries)}")
+    job = PdfJob(
+        pdf_path=pdf_path,
+        progress_callback=progress_callback,
+        log_callback=log_callback,
+        is_folder_processing=is_folder_processing,
+        resume=resume,
+        profile=profile,
+        collect_entries=collect_entries,
+        combined_writer=combined_writer
+    )
+    run_jobs([job])
+    if job.error is not None:
+        raise job.error
 
-    return all_entries, len(images)
+    return job.result
 
 
 if __name__ == "__main__":
     import sys
+    multiprocessing.freeze_support()
 
     def dummy_progress_callback(global_done, global_total, page_index, local_box_num, total_boxes):
         print(f"[Page {page_index + 3}] Box {local_box_num}/{total_boxes} | Total Progress: {global_done}/{global_total}")
 
-    if len(sys.argv) > 1:
-        if os.path.isdir(sys.argv[1]):
-            print(f"Processing folder: {sys.argv[1]}")
-            process_folder(sys.argv[1], log_callback=print)
-        elif sys.argv[1].lower().endswith('.pdf'):
-            print(f"Processing PDF: {sys.argv[1]}")
+    # --no-resume ignores checkpoints from earlier runs and starts from scratch
+    resume = "--no-resume" not in sys.argv
+    # --profile writes per-stage timings and OCR call counts for each PDF
+    profile = True if "--profile" in sys.argv else None
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+    if args:
+        if os.path.isdir(args[0]):
+            print(f"Processing folder: {args[0]}")
+            process_folder(args[0], log_callback=print, resume=resume, profile=profile)
+        elif args[0].lower().endswith('.pdf'):
+            print(f"Processing PDF: {args[0]}")
             process_pdf(
-                pdf_path=sys.argv[1],
+                pdf_path=args[0],
                 progress_callback=dummy_progress_callback,
-                log_callback=print
+                log_callback=print,
+                resume=resume,
+                profile=profile
             )
         else:
             print("Invalid argument. Please provide a PDF file or folder path.")
@@ -262,5 +193,7 @@ if __name__ == "__main__":
         process_pdf(
             pdf_path="data/input.pdf",
             progress_callback=dummy_progress_callback,
-            log_callback=print
+            log_callback=print,
+            resume=resume,
+            profile=profile
         )
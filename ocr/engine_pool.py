@@ -0,0 +1,240 @@
+import re
+import threading
+import time
+
+import numpy as np
+import pytesseract
+
+# Sets the OpenMP thread limit, so it has to come before tesserocr
+from .governor import tesseract_slot
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+from config import OCR_ENGINE, TESSDATA_PATH
+from .ocr_cache import cached_ocr
+from .profiling import active, count, record
+
+
+# Keep one initialized Tesseract API per thread per (lang, oem). OCR workers are
+# processes, so in practice this is one engine per worker per language/OEM and
+# the traineddata is loaded once instead of once per call.
+_local = threading.local()
+
+# (lang, oem) pairs tesserocr could not initialize; these go through pytesseract
+_unavailable = set()
+
+_OPTION_RE = re.compile(r'--(oem|psm)\s+(\d+)|-c\s+(\w+)=(\S*)')
+
+DATA_KEYS = ('level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+             'left', 'top', 'width', 'height', 'conf', 'text')
+
+
+def parse_config(config):
+    """
+    Split a pytesseract-style config string into (oem, psm, variables).
+    """
+    oem, psm, variables = 3, 3, {}
+    for option, number, name, value in _OPTION_RE.findall(config or ''):
+        if option == 'oem':
+            oem = int(number)
+        elif option == 'psm':
+            psm = int(number)
+        else:
+            variables[name] = value
+    return oem, psm, variables
+
+
+def engine_name():
+    if OCR_ENGINE == 'pytesseract' or tesserocr is None:
+        return 'pytesseract'
+    return 'tesserocr'
+
+
+def _get_api(lang, oem):
+    if engine_name() != 'tesserocr' or (lang, oem) in _unavailable:
+        return None
+
+    apis = getattr(_local, 'apis', None)
+    if apis is None:
+        apis = _local.apis = {}
+
+    api = apis.get((lang, oem))
+    if api is None:
+        kwargs = {'lang': lang, 'oem': oem}
+        if TESSDATA_PATH:
+            kwargs['path'] = TESSDATA_PATH
+        try:
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+        except RuntimeError as e:
+            if OCR_ENGINE == 'tesserocr':
+                raise
+            print(f"[WARNING] tesserocr could not load {lang} (oem {oem}), using pytesseract: {e}")
+            _unavailable.add((lang, oem))
+            return None
+        apis[(lang, oem)] = api
+    return api
+
+
+def _run(api, image, psm, variables, read):
+    """
+    Hand the pixel buffer straight to the engine (no PNG round trip), apply the
+    per-call settings, read the result and restore the engine's defaults.
+    """
+    image = np.ascontiguousarray(image)
+    h, w = image.shape[:2]
+    bpp = 1 if image.ndim == 2 else image.shape[2]
+
+    previous = {name: api.GetVariableAsString(name) for name in variables}
+    try:
+        for name, value in variables.items():
+            api.SetVariable(name, value)
+        api.SetPageSegMode(psm)
+        # Same channel interpretation as pytesseract, which reads arrays as RGB
+        api.SetImageBytes(image.tobytes(), w, h, bpp, w * bpp)
+        return read(api)
+    finally:
+        for name, value in previous.items():
+            api.SetVariable(name, value or '')
+        api.Clear()
+
+
+def _read_data(api):
+    data = {key: [] for key in DATA_KEYS}
+    api.Recognize()
+    ri = api.GetIterator()
+    if ri is None:
+        return data
+
+    RIL = tesserocr.RIL
+    block_num = par_num = line_num = word_num = 0
+    for word in tesserocr.iterate_level(ri, RIL.WORD):
+        if word.IsAtBeginningOf(RIL.BLOCK):
+            block_num, par_num, line_num = block_num + 1, 0, 0
+        if word.IsAtBeginningOf(RIL.PARA):
+            par_num, line_num = par_num + 1, 0
+        if word.IsAtBeginningOf(RIL.TEXTLINE):
+            line_num, word_num = line_num + 1, 0
+        word_num += 1
+
+        box = word.BoundingBox(RIL.WORD)
+        if box is None:
+            continue
+        x1, y1, x2, y2 = box
+        data['level'].append(5)
+        data['page_num'].append(1)
+        data['block_num'].append(block_num)
+        data['par_num'].append(par_num)
+        data['line_num'].append(line_num)
+        data['word_num'].append(word_num)
+        data['left'].append(x1)
+        data['top'].append(y1)
+        data['width'].append(x2 - x1)
+        data['height'].append(y2 - y1)
+        data['conf'].append(word.Confidence(RIL.WORD))
+        data['text'].append(word.GetUTF8Text(RIL.WORD) or '')
+    return data
+
+
+def _profiled(stage, run):
+    """
+    Wrap an engine call so that the calls that actually reach Tesseract (cache
+    misses) wait for a governor slot and, while profiling, are timed and
+    counted under `stage`.
+    """
+    def governed_run():
+        with tesseract_slot():
+            return run()
+
+    if active() is None:
+        return governed_run
+
+    def timed_run():
+        start = time.perf_counter()
+        try:
+            return governed_run()
+        finally:
+            record(stage, time.perf_counter() - start)
+            count(stage)
+
+    return timed_run
+
+
+def image_to_string(image, lang='eng', config=''):
+    """
+    Drop-in replacement for pytesseract.image_to_string on numpy images.
+    """
+    count('tesseract.string')
+    return cached_ocr('string', image, lang, config, engine_name(),
+                      _profiled('tesseract.string.run', lambda: _image_to_string(image, lang, config)))
+
+
+def _image_to_string(image, lang, config):
+    oem, psm, variables = parse_config(config)
+    api = _get_api(lang, oem)
+    if api is None:
+        return pytesseract.image_to_string(image, lang=lang, config=config)
+    return _run(api, image, psm, variables, lambda api: api.GetUTF8Text())
+
+
+def image_to_data(image, lang='eng', config=''):
+    """
+    Drop-in replacement for pytesseract.image_to_data(..., output_type=DICT).
+    Only word-level rows are returned when running on tesserocr.
+    """
+    count('tesseract.data')
+    return cached_ocr('data', image, lang, config, engine_name(),
+                      _profiled('tesseract.data.run', lambda: _image_to_data(image, lang, config)))
+
+
+def _image_to_data(image, lang, config):
+    oem, psm, variables = parse_config(config)
+    api = _get_api(lang, oem)
+    if api is None:
+        return pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+    return _run(api, image, psm, variables, _read_data)
+
+
+def image_to_symbols(image, lang='eng', config=''):
+    """
+    Recognized characters with their confidences: a list of [char, conf] pairs,
+    with ' ' between words. tesserocr gives true per-symbol confidences; with
+    pytesseract each character gets the confidence of its word.
+    """
+    count('tesseract.symbols')
+    return cached_ocr('symbols', image, lang, config, engine_name(),
+                      _profiled('tesseract.symbols.run', lambda: _image_to_symbols(image, lang, config)))
+
+
+def _image_to_symbols(image, lang, config):
+    oem, psm, variables = parse_config(config)
+    api = _get_api(lang, oem)
+    if api is None:
+        data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+        symbols = []
+        for word, conf in zip(data['text'], data['conf']):
+            word = word.strip()
+            if not word:
+                continue
+            if symbols:
+                symbols.append([' ', -1])
+            symbols.extend([char, float(conf)] for char in word)
+        return symbols
+    return _run(api, image, psm, variables, _read_symbols)
+
+
+def _read_symbols(api):
+    symbols = []
+    api.Recognize()
+    ri = api.GetIterator()
+    if ri is None:
+        return symbols
+
+    RIL = tesserocr.RIL
+    for symbol in tesserocr.iterate_level(ri, RIL.SYMBOL):
+        if symbols and symbol.IsAtBeginningOf(RIL.WORD):
+            symbols.append([' ', -1])
+        symbols.append([symbol.GetUTF8Text(RIL.SYMBOL) or '', symbol.Confidence(RIL.SYMBOL)])
+    return symbols
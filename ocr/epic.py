@@ -0,0 +1,158 @@
+import re
+from collections import Counter
+
+
+# EPIC (voter ID) formats printed on the rolls
+EPIC_PATTERN = re.compile(r'^[A-Z]{3}[0-9]{7}$')
+EPIC_SLASH_PATTERN = re.compile(r'^[A-Z]{2}/[0-9]{2}/[0-9]{3}/[0-9]{6}$')
+
+# Characters Tesseract confuses between the letter prefix and the digit part
+TO_LETTER = {'0': 'O', '1': 'I', '2': 'Z', '4': 'A', '5': 'S', '6': 'G', '7': 'T', '8': 'B'}
+TO_DIGIT = {'O': '0', 'Q': '0', 'D': '0', 'U': '0', 'I': '1', 'L': '1', 'J': '1', 'Z': '2',
+            'A': '4', 'S': '5', 'G': '6', 'T': '7', 'B': '8'}
+
+# A character read with at least this confidence is trusted and never repaired
+REPAIR_MAX_CONF = 95
+# Only IDs whose prefix characters were all read with this confidence teach
+# EpicPrefixModel a prefix
+PREFIX_LEARN_CONF = 90
+
+
+def is_valid_epic(text):
+    return bool(EPIC_PATTERN.fullmatch(text) or EPIC_SLASH_PATTERN.fullmatch(text))
+
+
+# Same-shape characters Tesseract swaps inside the 3-letter prefix
+PREFIX_CONFUSIONS = {
+    '0': 'ODQ', 'O': '0DQ', 'D': 'O0', 'Q': 'O0',
+    '1': 'ILJT', 'I': '1LJT', 'L': 'I1', 'J': 'I1', 'T': 'I1',
+    '5': 'S', 'S': '5', '8': 'B', 'B': '8', '2': 'Z', 'Z': '2',
+    '6': 'G', 'G': '6C', 'C': 'G', '4': 'A', 'A': '4', 'V': 'U', 'U': 'V',
+}
+
+
+def clean_symbols(symbols, keep_lowercase=False):
+    """
+    Apply the voter ID cleanup (drop lowercase, keep only A-Z, 0-9 and '/') to
+    [char, conf] pairs, keeping each surviving character's confidence.
+    With keep_lowercase=True lowercase letters are upper-cased instead of
+    dropped, which recovers IDs where e.g. 'I' was read as 'l'.
+    """
+    chars, confs = [], []
+    for char, conf in symbols:
+        for c in char:
+            if keep_lowercase:
+                c = c.upper()
+            if re.fullmatch(r'[A-Z0-9/]', c):
+                chars.append(c)
+                confs.append(conf)
+    return ''.join(chars), confs
+
+
+def _match_prefix(head, prefixes):
+    """
+    First known prefix that `head` can be turned into using only same-shape
+    substitutions, or None.
+    """
+    for prefix in prefixes:
+        if all(a == b or b in PREFIX_CONFUSIONS.get(a, '') for a, b in zip(head, prefix)):
+            return prefix
+    return None
+
+
+def repair_epic(text, confidences=None, max_fixes=2, prefixes=None):
+    """
+    Repair a 10-character EPIC that is a character or two off, without another
+    OCR pass. Returns the repaired ID or None.
+
+    The 3-letter prefix is matched against the roll's known `prefixes` (most
+    common first) when given, else each misplaced digit is mapped to its
+    look-alike letter; the 7 digits get the digit look-alikes (O/0, I/1, S/5,
+    ...). The repair is refused when more than `max_fixes` characters change,
+    a character has no known confusion, or a character that needs changing
+    was read with high confidence.
+
+    A well-formed ID whose prefix is a look-alike of a known prefix (LBG for
+    IBG) is corrected too.
+    """
+    if len(text) != 10:
+        return None
+
+    fixed = list(text)
+    head = text[:3]
+    known = head if head in (prefixes or ()) else _match_prefix(head, prefixes or ())
+    if known:
+        fixed[:3] = known
+    else:
+        for i, char in enumerate(head):
+            if not char.isalpha():
+                if char not in TO_LETTER:
+                    return None
+                fixed[i] = TO_LETTER[char]
+
+    for i in range(3, 10):
+        char = text[i]
+        if not char.isdigit():
+            if char not in TO_DIGIT:
+                return None
+            fixed[i] = TO_DIGIT[char]
+
+    changed = [i for i in range(10) if fixed[i] != text[i]]
+    if not changed or len(changed) > max_fixes:
+        return None
+    if confidences is not None and any(confidences[i] >= REPAIR_MAX_CONF for i in changed):
+        return None
+
+    fixed = ''.join(fixed)
+    return fixed if is_valid_epic(fixed) else None
+
+
+def repair_from_reads(reads, prefixes=None, max_fixes=2):
+    """
+    Try to repair a voter ID from the raw reads a box already made
+    ([text, confidences] per config tried), e.g. once the roll's prefixes are known.
+    """
+    for text, confidences in reads:
+        repaired = repair_epic(text, confidences, max_fixes=max_fixes, prefixes=prefixes)
+        if repaired:
+            return repaired
+    return None
+
+
+class EpicPrefixModel:
+    """
+    The EPIC prefixes used on a roll (e.g. 'IBG'), learned from the valid IDs
+    of its first pages. Rolls are dominated by one or two prefixes, so a read
+    like '1BG...' or 'LBG...' can be fixed to the right prefix with confidence.
+
+    Only reads that were not repaired and whose prefix was read confidently
+    are counted, and a prefix needs `min_share` of them to be known, well
+    above the rate of OCR misreads: otherwise an early 'LBG' would soon count
+    as a prefix of its own and stop being repaired to 'IBG'.
+    """
+
+    def __init__(self, min_samples=20, min_share=0.2):
+        self.min_samples = min_samples
+        self.min_share = min_share
+        self.counts = Counter()
+
+    def record(self, voter_id, confidences=None, repaired=False):
+        """
+        Count `voter_id`'s prefix. `confidences` are the read's per-character
+        confidences (None for an ID that was not OCR'd, e.g. from the text
+        layer); repaired IDs and unsure prefixes are skipped.
+        """
+        if repaired or not voter_id or not EPIC_PATTERN.fullmatch(voter_id):
+            return
+        if confidences is not None and (len(confidences) < 3 or min(confidences[:3]) < PREFIX_LEARN_CONF):
+            return
+        self.counts[voter_id[:3]] += 1
+
+    def dominant(self):
+        """
+        Known prefixes, most common first; empty until enough IDs have been seen.
+        """
+        total = sum(self.counts.values())
+        if total < self.min_samples:
+            return []
+        return [prefix for prefix, count in self.counts.most_common() if count / total >= self.min_share]
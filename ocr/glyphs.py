@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+
+from config import GLYPH_TEMPLATES, GLYPH_MIN_SCORE, GLYPH_MARGIN, GLYPH_HARVEST_CONF, GLYPH_TEMPLATES_PER_DIGIT
+from .profiling import count
+
+
+# Glyphs are compared as zero-mean, unit-norm vectors of this size (w, h), so
+# the dot product of two of them is their normalized cross-correlation
+GLYPH_SIZE = (12, 18)
+DIGITS = "0123456789"
+
+
+def segment(binary):
+    """
+    Cut a binarized field (dark text on white) into glyph images, left to
+    right. Specks and box remnants are dropped; pieces of one broken glyph
+    that overlap horizontally are joined.
+    """
+    ink = (binary < 128).astype(np.uint8)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    if n <= 1:
+        return []
+
+    boxes = [tuple(stats[i, :4]) for i in range(1, n) if stats[i, cv2.CC_STAT_AREA] >= 8]
+    if not boxes:
+        return []
+    tallest = max(h for _, _, _, h in boxes)
+    boxes = sorted((box for box in boxes if box[3] >= 0.5 * tallest), key=lambda box: box[0])
+
+    merged = []
+    for x, y, w, h in boxes:
+        if merged:
+            mx, my, mw, mh = merged[-1]
+            overlap = min(mx + mw, x + w) - max(mx, x)
+            if overlap > 0.5 * min(mw, w):
+                x1, y1 = min(mx, x), min(my, y)
+                merged[-1] = (x1, y1, max(mx + mw, x + w) - x1, max(my + mh, y + h) - y1)
+                continue
+        merged.append((x, y, w, h))
+
+    return [ink[y:y + h, x:x + w] for x, y, w, h in merged]
+
+
+def glyph_vector(glyph):
+    vector = cv2.resize(glyph.astype(np.float32), GLYPH_SIZE, interpolation=cv2.INTER_AREA).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class GlyphTemplates:
+    """
+    Digit templates for one fixed-font field (age, house number, serial),
+    harvested from the field's own confident Tesseract reads.
+
+    A field is only read from templates once every digit has been seen, and a
+    glyph only counts as recognized when its best match clears `min_score`
+    and beats the best other digit by `margin`; anything else is left to
+    Tesseract.
+    """
+
+    def __init__(self, per_digit=GLYPH_TEMPLATES_PER_DIGIT, min_score=GLYPH_MIN_SCORE, margin=GLYPH_MARGIN):
+        self.per_digit = per_digit
+        self.min_score = min_score
+        self.margin = margin
+        self.vectors = {digit: [] for digit in DIGITS}
+        self._matrix = None
+        self._labels = None
+
+    @property
+    def ready(self):
+        return all(self.vectors.values())
+
+    def _stack(self):
+        if self._matrix is None:
+            pairs = [(digit, vector) for digit, vectors in self.vectors.items() for vector in vectors]
+            self._labels = np.array([digit for digit, _ in pairs])
+            self._matrix = np.stack([vector for _, vector in pairs])
+        return self._matrix, self._labels
+
+    def _scores(self, vector):
+        """
+        Best score per digit, as a (10,) array in DIGITS order.
+        """
+        matrix, labels = self._stack()
+        scores = matrix @ vector
+        return np.array([scores[labels == digit].max() if (labels == digit).any() else -1.0 for digit in DIGITS])
+
+    def read(self, binary):
+        """
+        The digit string in `binary`, or None when any glyph is not a clear match.
+        """
+        if not self.ready:
+            return None
+        glyphs = segment(binary)
+        if not glyphs:
+            return None
+
+        text = ""
+        for glyph in glyphs:
+            scores = self._scores(glyph_vector(glyph))
+            best, second = np.argsort(scores)[::-1][:2]
+            if scores[best] < self.min_score or scores[best] - scores[second] < self.margin:
+                return None
+            text += DIGITS[best]
+        return text
+
+    def learn(self, binary, text):
+        """
+        Add the glyphs of a trusted read. Skipped unless `text` is all digits
+        and segments into exactly one glyph per digit; a glyph that looks more
+        like another digit than its own label is not added.
+        """
+        if not text.isdigit():
+            return 0
+        glyphs = segment(binary)
+        if len(glyphs) != len(text):
+            return 0
+
+        added = 0
+        for glyph, digit in zip(glyphs, text):
+            vectors = self.vectors[digit]
+            if len(vectors) >= self.per_digit:
+                continue
+            vector = glyph_vector(glyph)
+            if any(self.vectors.values()):
+                scores = self._scores(vector)
+                if vectors:
+                    # Near-duplicate of a template it already has, or closer to another digit
+                    if scores[DIGITS.index(digit)] >= 0.98 or DIGITS[int(scores.argmax())] != digit:
+                        continue
+                elif scores.max() >= 0.95:
+                    # First sample of this digit, but it is the spitting image of another one
+                    continue
+            vectors.append(vector)
+            self._matrix = None
+            added += 1
+        return added
+
+
+# One set of templates per field in each worker process, built up as it goes
+_templates = {}
+
+
+def _field(field):
+    templates = _templates.get(field)
+    if templates is None:
+        templates = _templates[field] = GlyphTemplates()
+    return templates
+
+
+def read_digits(field, binary):
+    """
+    `field` read from glyph templates, or None to fall back to Tesseract.
+    """
+    if not GLYPH_TEMPLATES:
+        return None
+    text = _field(field).read(binary)
+    count(f"glyphs.{field}.hit" if text else f"glyphs.{field}.miss")
+    return text
+
+
+def learn_digits(field, binary, text, conf):
+    """
+    Harvest templates from a Tesseract read of `field`; `conf` is its mean
+    word confidence, and reads below GLYPH_HARVEST_CONF are ignored.
+    """
+    if not GLYPH_TEMPLATES or conf < GLYPH_HARVEST_CONF:
+        return
+    added = _field(field).learn(binary, text)
+    if added:
+        count(f"glyphs.{field}.learned", added)
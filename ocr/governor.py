@@ -0,0 +1,122 @@
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+
+from config import TESSERACT_THREADS, TESSERACT_CORE_BUDGET
+from .profiling import record
+
+
+def apply_thread_limit(threads=TESSERACT_THREADS, override=False):
+    """
+    Cap the OpenMP threads Tesseract may start in this process and in the
+    tesseract binaries it runs. libgomp reads this when it is loaded, so it
+    must happen before tesserocr is imported; an explicit OMP_THREAD_LIMIT in
+    the environment wins unless `override`.
+    """
+    if not threads:
+        return
+    for name in ("OMP_THREAD_LIMIT", "OMP_NUM_THREADS"):
+        if override or name not in os.environ:
+            os.environ[name] = str(threads)
+
+
+def _openmp_runtime():
+    """
+    libgomp (as loaded by tesserocr), or None when it cannot be found.
+    """
+    name = ctypes.util.find_library("gomp")
+    if name is None:
+        return None
+    try:
+        return ctypes.CDLL(name)
+    except OSError:
+        return None
+
+
+def set_openmp_threads(threads):
+    """
+    Limit the OpenMP runtime of this process to `threads` at run time.
+    libgomp reads the environment only once, when it is loaded, so a worker
+    forked from a parent that already loaded it needs this as well as the
+    environment. Uses threadpoolctl when it is installed.
+    """
+    if not threads:
+        return
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads, user_api="openmp")
+        return
+    except ImportError:
+        pass
+    runtime = _openmp_runtime()
+    if runtime is not None:
+        runtime.omp_set_num_threads(int(threads))
+
+
+def openmp_threads():
+    """
+    Threads an OpenMP parallel region in this process would use now, or None
+    when libgomp is not available.
+    """
+    runtime = _openmp_runtime()
+    return runtime.omp_get_max_threads() if runtime is not None else None
+
+
+def tesseract_slots(cores, threads=TESSERACT_THREADS, budget=TESSERACT_CORE_BUDGET):
+    """
+    How many Tesseract calls may run at once: the core budget divided by the
+    threads each call uses.
+    """
+    return max(1, (budget or cores) // max(1, threads or 1))
+
+
+def make_semaphore(workers, cores, threads=TESSERACT_THREADS, budget=TESSERACT_CORE_BUDGET):
+    """
+    Cross-process semaphore for the OCR workers, or None when `workers` could
+    never exceed the budget (each worker runs one call at a time).
+    """
+    slots = tesseract_slots(cores, threads, budget)
+    if slots >= workers:
+        return None
+    return multiprocessing.BoundedSemaphore(slots)
+
+
+# Set in each OCR worker by init_worker
+_semaphore = None
+
+
+def init_worker(semaphore, threads=TESSERACT_THREADS):
+    """
+    ProcessPoolExecutor initializer: the worker's thread limit and its share
+    of the Tesseract budget. The environment covers spawned workers and the
+    tesseract binaries pytesseract runs; a forked worker inherits the parent's
+    OpenMP runtime, which is limited directly.
+    """
+    global _semaphore
+    apply_thread_limit(threads, override=True)
+    set_openmp_threads(threads)
+    _semaphore = semaphore
+
+
+@contextmanager
+def tesseract_slot():
+    """
+    Hold one of the budgeted Tesseract slots for the duration of the block.
+    """
+    if _semaphore is None:
+        yield
+        return
+    start = time.perf_counter()
+    _semaphore.acquire()
+    record("tesseract.wait", time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        _semaphore.release()
+
+
+# Before anything in this process loads libgomp
+apply_thread_limit()
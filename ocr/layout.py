@@ -0,0 +1,69 @@
+import cv2
+
+from .preprocessing import remove_boxes
+from .profiling import stage
+
+
+# Field rectangles inside a voter box, as (y1, y2, x1, x2) fractions of its size
+FIELD_ROIS = {
+    "voterId": (0.04, 0.18, 0.6, 0.98),
+    "serial": (0.05, 0.25, 0.2, 0.35),
+    "name": (0.23, 0.36, 0.11, 0.65),
+    "house": (0.47, 0.59, 0.226, 0.5),
+    "age": (0.58, 0.7, 0.12, 0.17),
+    "photo": (0.21, 0.95, 0.7, 0.98),
+    "text": (0.2, 1.0, 0.0, 1.0),
+}
+
+
+class BoxLayout:
+    """
+    Layout of one voter box: a single grayscale pass and every field rectangle
+    located once.
+
+    The extractors take their ROIs and binarized buffers from here instead of
+    each converting, resizing and thresholding the box on their own. `gray` is
+    the box as cropped; `clean` is the same buffer with the frame, serial box
+    and photo blanked out (remove_boxes), which is what the field extractors read.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.h, self.w = image.shape[:2]
+        self.gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.rects = {name: self._rect(fractions) for name, fractions in FIELD_ROIS.items()}
+        self._clean = None
+        self._buffers = {}
+
+    def _rect(self, fractions):
+        y1, y2, x1, x2 = fractions
+        return int(y1 * self.h), int(y2 * self.h), int(x1 * self.w), int(x2 * self.w)
+
+    @property
+    def clean(self):
+        if self._clean is None:
+            with stage("remove_boxes"):
+                self._clean = remove_boxes(self.gray)
+        return self._clean
+
+    def roi(self, field, clean=True):
+        """
+        View of a field rectangle (no copy).
+        """
+        y1, y2, x1, x2 = self.rects[field]
+        source = self.clean if clean else self.gray
+        return source[y1:y2, x1:x2]
+
+    def binarized(self, field, scale, blur=False, clean=True):
+        """
+        Field ROI upscaled by `scale`, optionally smoothed, then Otsu-thresholded.
+        Computed once per box and shared by every extractor that asks for it.
+        """
+        key = (field, scale, blur, clean)
+        if key not in self._buffers:
+            resized = cv2.resize(self.roi(field, clean), None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            if blur:
+                resized = cv2.GaussianBlur(resized, (3, 3), 0)
+            _, thresh = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            self._buffers[key] = thresh
+        return self._buffers[key]
@@ -0,0 +1,191 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from config import OCR_CACHE_PATH, OCR_CACHE_MAX_MB
+from .profiling import count
+
+
+class OcrCache:
+    """
+    On-disk OCR result cache keyed by a hash of the exact pixels handed to
+    Tesseract plus the language, config string and engine.
+
+    Re-running a roll after a parser or threshold change produces the same ROI
+    buffers, so every OCR call becomes a lookup. The cache is bounded to
+    `max_bytes` of stored results; least recently used entries go first.
+
+    Every worker process shares the file, so a lookup never writes: new
+    results and the keys that were hit are held in memory until flush()
+    stores the results and refreshes the hits' last_used in one transaction
+    (once per box, see flush_cache).
+    """
+
+    EVICT_CHECK_EVERY = 200
+    # Flush on its own when this many results or hits are waiting
+    MAX_PENDING = 500
+
+    def __init__(self, path, max_bytes):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_bytes = max_bytes
+        self._inserts = 0
+        self._pending = {}
+        self._hits = set()
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(image, kind, lang, config, engine):
+        image = np.ascontiguousarray(image)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(memoryview(image).cast('B'))
+        digest.update(f"|{image.shape}|{image.dtype}|{kind}|{lang}|{config}|{engine}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        value = self._pending.get(key)
+        if value is None:
+            row = self.conn.execute("SELECT value FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value = row[0]
+            self._hits.add(key)
+            if len(self._hits) >= self.MAX_PENDING:
+                self.flush()
+        return json.loads(value)
+
+    def put(self, key, value):
+        self._pending[key] = json.dumps(value, ensure_ascii=False)
+        if len(self._pending) >= self.MAX_PENDING:
+            self.flush()
+
+    def flush(self):
+        """
+        Store the pending results and mark the keys hit since the last flush
+        as used, in one transaction. Both are dropped when that fails (the
+        error is raised), so a locked file costs cache misses or a slightly
+        stale LRU order later, never a stuck worker.
+        """
+        if not self._pending and not self._hits:
+            return
+        now = time.time()
+        rows = [(key, value, len(value.encode('utf-8')) + len(key), now) for key, value in self._pending.items()]
+        touched = [(now, key) for key in self._hits]
+        self._pending = {}
+        self._hits = set()
+        with self.conn:
+            if rows:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO ocr_cache (key, value, size, last_used) VALUES (?, ?, ?, ?)", rows
+                )
+            if touched:
+                self.conn.executemany("UPDATE ocr_cache SET last_used = ? WHERE key = ?", touched)
+
+        previous = self._inserts
+        self._inserts += len(rows)
+        if self._inserts // self.EVICT_CHECK_EVERY != previous // self.EVICT_CHECK_EVERY:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least recently used entries until the cache is under 90% of its limit.
+        """
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        while total > target:
+            rows = self.conn.execute(
+                "SELECT key, size FROM ocr_cache ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            self.conn.executemany("DELETE FROM ocr_cache WHERE key = ?", [(key,) for key, _ in rows])
+            self.conn.commit()
+            total -= sum(size for _, size in rows)
+
+
+_cache = None
+_cache_pid = None
+_cache_failed = False
+
+
+def get_cache():
+    """
+    The OCR cache for this process, or None when caching is disabled.
+    Each worker process opens its own connection.
+    """
+    global _cache, _cache_pid
+    if not OCR_CACHE_PATH or _cache_failed:
+        return None
+    if _cache is None or _cache_pid != os.getpid():
+        _cache = OcrCache(OCR_CACHE_PATH, int(OCR_CACHE_MAX_MB * 1024 * 1024))
+        _cache_pid = os.getpid()
+        # Results a process keeps after its last box (outside the worker tasks)
+        atexit.register(flush_cache)
+    return _cache
+
+
+def cached_ocr(kind, image, lang, config, engine, run):
+    """
+    Return the cached result of `run()` for these pixels and settings, running
+    it and storing the result on a miss. Cache errors never fail the OCR call.
+    """
+    global _cache_failed
+    try:
+        cache = get_cache()
+    except sqlite3.Error as e:
+        print(f"[WARNING] OCR cache disabled: {e}")
+        _cache_failed = True
+        return run()
+    if cache is None:
+        return run()
+
+    key = cache.make_key(image, kind, lang, config, engine)
+    try:
+        value = cache.get(key)
+        if value is not None:
+            return value
+    except sqlite3.Error as e:
+        print(f"[WARNING] OCR cache lookup failed: {e}")
+        count("ocr_cache.errors")
+
+    value = run()
+    try:
+        cache.put(key, value)
+    except sqlite3.Error as e:
+        print(f"[WARNING] OCR cache write failed, results dropped: {e}")
+        count("ocr_cache.errors")
+    return value
+
+
+def flush_cache():
+    """
+    Store this process's pending OCR results; worker tasks call this once
+    they are done with a box or page.
+    """
+    if _cache is None or _cache_pid != os.getpid():
+        return
+    try:
+        _cache.flush()
+    except sqlite3.Error as e:
+        print(f"[WARNING] OCR cache write failed: {e}")
+        count("ocr_cache.errors")
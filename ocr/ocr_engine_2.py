@@ -1,19 +1,32 @@
 import re
-import pytesseract
+from functools import lru_cache
 import cv2
 import numpy as np
 from PIL import Image
+from .engine_pool import image_to_string, image_to_data, image_to_symbols
+from .epic import is_valid_epic, clean_symbols, repair_epic
+from .glyphs import read_digits, learn_digits
+from .layout import BoxLayout
+from .page_cropper import grid_geometry
+from .preprocessing import blank_boxes
+from .profiling import timed, count
 
 
 
 
-def perform_ocr(image):
-    voterId = extract_voterId_2(image)
-    full_text = full_ocr(image)
+@timed
+def perform_ocr(image, layout=None, full_text=None, voter_id_configs=None, epic_prefixes=None, trace=None):
+    # One grayscale/threshold pass per box, shared by every extractor below
+    layout = layout or BoxLayout(image)
+
+    voterId = extract_voterId_2(image, layout, configs=voter_id_configs, prefixes=epic_prefixes, trace=trace)
+    # full_text is passed in when the whole page was OCR'd at once (page_full_ocr)
+    if full_text is None:
+        full_text = full_ocr(image, layout)
 
     # print("Full Text \n" + full_text)
-    age = extract_age(image)
-    houseNumber = extract_houseNumber(image)
+    age = extract_age(image, layout)
+    houseNumber = extract_houseNumber(image, layout)
     data = parse_voter_info(full_text)
     # print("Data from Parser : ")
     # for key, value in data.items():
@@ -24,7 +37,7 @@ def perform_ocr(image):
 
     name = data.get('name')
     if not name:
-        name = extract_name(image);
+        name = extract_name(image, layout)
         if not name:
             name = "Name Unavailable"
 
@@ -43,7 +56,7 @@ def perform_ocr(image):
             if age == '0':
                 age = "1" + age
             else:
-                newage = extract_age_fallback_1_sensitive(image)
+                newage = extract_age_fallback_1_sensitive(image, layout)
                 if newage.strip() != '':
                     if int(newage) < 18:
                         age = age + "1"
@@ -73,6 +86,137 @@ def devanagari_to_english_digits(text):
 
 
 
+# OCR-error variants of the relation and gender words. Each list is compiled
+# into a single alternation below, so a token is checked against a whole list
+# in one regex scan; lists are still tried in priority order.
+
+# पति variations (OCR errors)
+pati_patterns = [
+    r'पति', r'पती', r'पतर', r'पत्र', r'पि?ति', r'पि?ती', 
+    r'पिति', r'पिती', r'पत्ति', r'पत्ती', r'पति?', r'पती?',
+    r'पिि?ति', r'पिि?ती', r'पत्ि?ति', r'पत्ि?ती'
+]
+
+# पिता variations (OCR errors)
+pita_patterns = [
+    r'पिता', r'पििता', r'पीता', r'पीिता', r'पि?ता', r'पीि?ता',
+    r'पितिा', r'पीतिा', r'पि?तिा', r'पीि?तिा', r'पिता?', r'पीता?',
+    r'पि?ि?ता', r'पि?ि?ता?'
+]
+
+# अन्य variations (OCR errors)
+anya_patterns = [
+    r'अन्य', r'अन्या', r'अन्यि', r'अन्यि?', r'अन्या?', r'अन्ि?य',
+    r'अन्ि?या', r'अन्ि?यि', r'अन्ि?यि?', r'अन्ि?या?', r'अि?न्य',
+    r'अि?न्या', r'अि?न्यि', r'अि?न्यि?', r'अि?न्या?'
+]
+
+# पुरुष variations (OCR errors)
+purush_patterns = [
+    r'पुरुष', r'पुरुि?ष', r'पुरुि?ि?ष', r'पुरुष?', r'पुरुि?ष?',
+    r'पुरुि?', r'पुरुि?ि?', r'पुरुष।?', r'पुरुि?ष।?',
+    r'पुरुष्', r'पुरुि?ष्', r'पुरुि?ि?ष्', r'पुरुष्?',
+    r'पुरुि?ष्?', r'पुरुि?ि?ष्?', r'पुरुष।', r'पुरुि?ष।',
+    r'पुरुि?ि?ष।', r'पुरुष।?', r'पुरुि?ष।?', r'पुरुि?ि?ष।?',
+    r'पुरुष्।', r'पुरुि?ष्।', r'पुरुि?ि?ष्।', r'पुरुष्।?',
+    r'पुि?रुष', r'पुि?रुि?ष', r'पुि?रुि?ि?ष', r'पुि?रुष?',
+    r'पुि?रुि?ष?', r'पुि?रुि?ि?ष?', r'पुि?रुष।', r'पुि?रुि?ष।',
+    r'पुि?रुि?ि?ष।', r'पुि?रुष।?', r'पुि?रुि?ष।?', r'पुि?रुि?ि?ष।?',
+    r'पुि?रुष्', r'पुि?रुि?ष्', r'पुि?रुि?ि?ष्', r'पुि?रुष्?',
+    r'पुि?रुि?ष्?', r'पुि?रुि?ि?ष्?', r'पुि?रुष्।', r'पुि?रुि?ष्।',
+    r'पुि?रुि?ि?ष्।', r'पुि?रुष्।?', r'पुि?रुि?ष्।?', r'पुि?रुि?ि?ष्।?'
+]
+
+# महिला variations (OCR errors)
+mahila_patterns = [
+    r'महिला', r'महिि?ला', r'महिि?ि?ला', r'महिला?', r'महिि?ला?',
+    r'महिि?ि?ला?', r'महिला।', r'महिि?ला।', r'महिि?ि?ला।',
+    r'महिला।?', r'महिि?ला।?', r'महिि?ि?ला।?', r'महिला्',
+    r'महिि?ला्', r'महिि?ि?ला्', r'महिला्?', r'महिि?ला्?',
+    r'महिि?ि?ला्?', r'महिला्।', r'महिि?ला्।', r'महिि?ि?ला्।',
+    r'महिला्।?', r'महिि?ला्।?', r'महिि?ि?ला्।?', r'मि?हिला',
+    r'मि?हिि?ला', r'मि?हिि?ि?ला', r'मि?हिला?', r'मि?हिि?ला?',
+    r'मि?हिि?ि?ला?', r'मि?हिला।', r'मि?हिि?ला।', r'मि?हिि?ि?ला।',
+    r'मि?हिला।?', r'मि?हिि?ला।?', r'मि?हिि?ि?ला।?', r'मि?हिला्',
+    r'मि?हिि?ला्', r'मि?हिि?ि?ला्', r'मि?हिला्?', r'मि?हिि?ला्?',
+    r'मि?हिि?ि?ला्?', r'मि?हिला्।', r'मि?हिि?ला्।', r'मि?हिि?ि?ला्।',
+    r'मि?हिला्।?', r'मि?हिि?ला्।?', r'मि?हिि?ि?ला्।?'
+]
+
+
+def _compile_any(patterns):
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+
+RELATION_PATTERNS = [
+    ('पति', _compile_any(pati_patterns)),
+    ('पिता', _compile_any(pita_patterns)),
+    ('अन्य', _compile_any(anya_patterns)),
+]
+
+GENDER_PATTERNS = [
+    ('पुरुष', _compile_any(purush_patterns)),
+    ('महिला', _compile_any(mahila_patterns)),
+]
+
+PUNCTUATION_RE = re.compile(r'[।.,:;]+')
+
+
+@lru_cache(maxsize=4096)
+def normalize_relation(text):
+    """Normalize relation with OCR error handling"""
+    text = text.strip().lower()
+    
+    # Remove common punctuation
+    text = PUNCTUATION_RE.sub('', text)
+    
+    for relation, pattern in RELATION_PATTERNS:
+        if pattern.search(text):
+            return relation
+    
+    # Fallback: if contains 'प' and 'त' and 'ि', likely पति
+    if 'प' in text and 'त' in text and 'ि' in text and len(text) <= 6:
+        return 'पति'
+    
+    # Fallback: if contains 'प' and 'त' and 'ा', likely पिता
+    if 'प' in text and 'त' in text and 'ा' in text and len(text) <= 6:
+        return 'पिता'
+    
+    # Fallback: if contains 'अ' and 'न' and 'य', likely अन्य
+    if 'अ' in text and 'न' in text and 'य' in text and len(text) <= 6:
+        return 'अन्य'
+    
+    return text  # Return original if no match
+
+
+@lru_cache(maxsize=4096)
+def normalize_gender(text):
+    """Normalize gender with OCR error handling"""
+    text = text.strip().lower()
+    
+    # Remove common punctuation
+    text = PUNCTUATION_RE.sub('', text)
+    
+    for gender, pattern in GENDER_PATTERNS:
+        if pattern.search(text):
+            return gender
+    
+    # Fallback logic for पुरुष
+    if ('प' in text and 'र' in text and 'ष' in text) or \
+       ('प' in text and 'र' in text and 'स' in text) or \
+       ('प' in text and 'ु' in text and 'र' in text):
+        return 'पुरुष'
+    
+    # Fallback logic for महिला
+    if ('म' in text and 'ह' in text and 'ल' in text) or \
+       ('म' in text and 'ि' in text and 'ल' in text) or \
+       ('म' in text and 'ा' in text and 'ल' in text):
+        return 'महिला'
+    
+    return text  # Return original if no match
+
+
+@timed
 def parse_voter_info(text):
     """
     Super robust parser for voter information strings.
@@ -91,126 +235,6 @@ def parse_voter_info(text):
         "gender": ""
     }
     
-    def normalize_relation(text):
-        """Normalize relation with OCR error handling"""
-        text = text.strip().lower()
-        
-        # Remove common punctuation
-        text = re.sub(r'[।.,:;]+', '', text)
-        
-        # पति variations (OCR errors)
-        pati_patterns = [
-            r'पति', r'पती', r'पतर', r'पत्र', r'पि?ति', r'पि?ती', 
-            r'पिति', r'पिती', r'पत्ति', r'पत्ती', r'पति?', r'पती?',
-            r'पिि?ति', r'पिि?ती', r'पत्ि?ति', r'पत्ि?ती'
-        ]
-        
-        # पिता variations (OCR errors)
-        pita_patterns = [
-            r'पिता', r'पििता', r'पीता', r'पीिता', r'पि?ता', r'पीि?ता',
-            r'पितिा', r'पीतिा', r'पि?तिा', r'पीि?तिा', r'पिता?', r'पीता?',
-            r'पि?ि?ता', r'पि?ि?ता?'
-        ]
-        
-        # अन्य variations (OCR errors)
-        anya_patterns = [
-            r'अन्य', r'अन्या', r'अन्यि', r'अन्यि?', r'अन्या?', r'अन्ि?य',
-            r'अन्ि?या', r'अन्ि?यि', r'अन्ि?यि?', r'अन्ि?या?', r'अि?न्य',
-            r'अि?न्या', r'अि?न्यि', r'अि?न्यि?', r'अि?न्या?'
-        ]
-        
-        # Check for पति patterns
-        for pattern in pati_patterns:
-            if re.search(pattern, text):
-                return 'पति'
-        
-        # Check for पिता patterns
-        for pattern in pita_patterns:
-            if re.search(pattern, text):
-                return 'पिता'
-        
-        # Check for अन्य patterns
-        for pattern in anya_patterns:
-            if re.search(pattern, text):
-                return 'अन्य'
-        
-        # Fallback: if contains 'प' and 'त' and 'ि', likely पति
-        if 'प' in text and 'त' in text and 'ि' in text and len(text) <= 6:
-            return 'पति'
-        
-        # Fallback: if contains 'प' and 'त' and 'ा', likely पिता
-        if 'प' in text and 'त' in text and 'ा' in text and len(text) <= 6:
-            return 'पिता'
-        
-        # Fallback: if contains 'अ' and 'न' and 'य', likely अन्य
-        if 'अ' in text and 'न' in text and 'य' in text and len(text) <= 6:
-            return 'अन्य'
-        
-        return text  # Return original if no match
-    
-    def normalize_gender(text):
-        """Normalize gender with OCR error handling"""
-        text = text.strip().lower()
-        
-        # Remove common punctuation
-        text = re.sub(r'[।.,:;]+', '', text)
-        
-        # पुरुष variations (OCR errors)
-        purush_patterns = [
-            r'पुरुष', r'पुरुि?ष', r'पुरुि?ि?ष', r'पुरुष?', r'पुरुि?ष?',
-            r'पुरुि?', r'पुरुि?ि?', r'पुरुष।?', r'पुरुि?ष।?',
-            r'पुरुष्', r'पुरुि?ष्', r'पुरुि?ि?ष्', r'पुरुष्?',
-            r'पुरुि?ष्?', r'पुरुि?ि?ष्?', r'पुरुष।', r'पुरुि?ष।',
-            r'पुरुि?ि?ष।', r'पुरुष।?', r'पुरुि?ष।?', r'पुरुि?ि?ष।?',
-            r'पुरुष्।', r'पुरुि?ष्।', r'पुरुि?ि?ष्।', r'पुरुष्।?',
-            r'पुि?रुष', r'पुि?रुि?ष', r'पुि?रुि?ि?ष', r'पुि?रुष?',
-            r'पुि?रुि?ष?', r'पुि?रुि?ि?ष?', r'पुि?रुष।', r'पुि?रुि?ष।',
-            r'पुि?रुि?ि?ष।', r'पुि?रुष।?', r'पुि?रुि?ष।?', r'पुि?रुि?ि?ष।?',
-            r'पुि?रुष्', r'पुि?रुि?ष्', r'पुि?रुि?ि?ष्', r'पुि?रुष्?',
-            r'पुि?रुि?ष्?', r'पुि?रुि?ि?ष्?', r'पुि?रुष्।', r'पुि?रुि?ष्।',
-            r'पुि?रुि?ि?ष्।', r'पुि?रुष्।?', r'पुि?रुि?ष्।?', r'पुि?रुि?ि?ष्।?'
-        ]
-        
-        # महिला variations (OCR errors)
-        mahila_patterns = [
-            r'महिला', r'महिि?ला', r'महिि?ि?ला', r'महिला?', r'महिि?ला?',
-            r'महिि?ि?ला?', r'महिला।', r'महिि?ला।', r'महिि?ि?ला।',
-            r'महिला।?', r'महिि?ला।?', r'महिि?ि?ला।?', r'महिला्',
-            r'महिि?ला्', r'महिि?ि?ला्', r'महिला्?', r'महिि?ला्?',
-            r'महिि?ि?ला्?', r'महिला्।', r'महिि?ला्।', r'महिि?ि?ला्।',
-            r'महिला्।?', r'महिि?ला्।?', r'महिि?ि?ला्।?', r'मि?हिला',
-            r'मि?हिि?ला', r'मि?हिि?ि?ला', r'मि?हिला?', r'मि?हिि?ला?',
-            r'मि?हिि?ि?ला?', r'मि?हिला।', r'मि?हिि?ला।', r'मि?हिि?ि?ला।',
-            r'मि?हिला।?', r'मि?हिि?ला।?', r'मि?हिि?ि?ला।?', r'मि?हिला्',
-            r'मि?हिि?ला्', r'मि?हिि?ि?ला्', r'मि?हिला्?', r'मि?हिि?ला्?',
-            r'मि?हिि?ि?ला्?', r'मि?हिला्।', r'मि?हिि?ला्।', r'मि?हिि?ि?ला्।',
-            r'मि?हिला्।?', r'मि?हिि?ला्।?', r'मि?हिि?ि?ला्।?'
-        ]
-        
-        # Check for पुरुष patterns
-        for pattern in purush_patterns:
-            if re.search(pattern, text):
-                return 'पुरुष'
-        
-        # Check for महिला patterns
-        for pattern in mahila_patterns:
-            if re.search(pattern, text):
-                return 'महिला'
-        
-        # Fallback logic for पुरुष
-        if ('प' in text and 'र' in text and 'ष' in text) or \
-           ('प' in text and 'र' in text and 'स' in text) or \
-           ('प' in text and 'ु' in text and 'र' in text):
-            return 'पुरुष'
-        
-        # Fallback logic for महिला
-        if ('म' in text and 'ह' in text and 'ल' in text) or \
-           ('म' in text and 'ि' in text and 'ल' in text) or \
-           ('म' in text and 'ा' in text and 'ल' in text):
-            return 'महिला'
-        
-        return text  # Return original if no match
-    
     for line in lines:
         line = line.strip()
         if not line:
@@ -285,37 +309,126 @@ def parse_voter_info(text):
 
 
 
-def extract_name(image):
-    h,w = image.shape[:2]
-    name_img = image[int(0.23*h):int(0.36*h), int(0.11*w):int(0.65*w)]
+@timed
+def extract_name(image, layout=None):
+    layout = layout or BoxLayout(image)
+    name_img = layout.roi("name")
 
-    config = '--oem 3 --psm 6'
-    text =  pytesseract.image_to_string(name_img, lang='hin', config=config).strip()
-    if not text:
-        config = '--oem 3 --psm 11'
-        text =  pytesseract.image_to_string(name_img, lang='hin', config=config).strip()
-    if not text:
-        config = '--oem 3 --psm 8'
-        text =  pytesseract.image_to_string(name_img, lang='hin', config=config).strip()
+    text = ""
+    for config in ('--oem 3 --psm 6', '--oem 3 --psm 11', '--oem 3 --psm 8'):
+        count("extract_name.configs")
+        text =  image_to_string(name_img, lang='hin', config=config).strip()
+        if text:
+            break
     return text
 
 
-def full_ocr(image):
-    h,w = image.shape[:2]
-    image = image[int(0.2*h):, :]
+@timed
+def full_ocr(image, layout=None):
+    layout = layout or BoxLayout(image)
+    image = layout.roi("text")
     config = '--oem 3 --psm 11'
-    text =  pytesseract.image_to_string(image, lang='hin', config=config).strip()
+    text =  image_to_string(image, lang='hin', config=config).strip()
     return text
 
-def extract_seq(image): 
-    h, w = image.shape[:2]
 
-    # Crop rough box area
-    sequence_img = image[int(0.05*h):int(0.25*h), int(0.2*w):int(0.35*w)]
-    gray = cv2.cvtColor(sequence_img, cv2.COLOR_BGR2GRAY)
+@timed
+def page_full_ocr(page_gray):
+    """
+    Whole-page alternative to calling full_ocr on each of the 30 boxes.
+
+    The text area of every grid cell is kept (frame, serial box, photo and the
+    voter ID strip blanked exactly as full_ocr sees them), the page is OCR'd once,
+    and each word is assigned back to its cell by the centre of its bounding box.
+    Returns one reconstructed text per cell, in crop_10x3_grid order.
+    """
+    h, w = page_gray.shape[:2]
+    top_offset, side_offset, box_h, box_w = grid_geometry(h, w)
+
+    masked = np.full_like(page_gray, 255)
+    grid = (slice(top_offset, top_offset + 10 * box_h), slice(side_offset, side_offset + 3 * box_w))
+    masked[grid] = page_gray[grid]
+    text_top = int(0.2 * box_h)
+    for row in range(10):
+        for col in range(3):
+            y1 = top_offset + row * box_h
+            x1 = side_offset + col * box_w
+            cell = masked[y1:y1 + box_h, x1:x1 + box_w]
+            blank_boxes(cell)
+            cell[:text_top] = 255
+
+    config = '--oem 3 --psm 11'
+    data = image_to_data(masked, lang='hin', config=config)
+
+    cell_words = [[] for _ in range(30)]
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word:
+            continue
+        left, top = int(data['left'][i]), int(data['top'][i])
+        width, height = int(data['width'][i]), int(data['height'][i])
+        row = (top + height // 2 - top_offset) // box_h
+        col = (left + width // 2 - side_offset) // box_w
+        if 0 <= row < 10 and 0 <= col < 3:
+            cell_words[row * 3 + col].append((left, top, width, height, word))
+
+    return [_join_lines(words) for words in cell_words]
+
+
+def _join_lines(words):
+    """
+    Rebuild text lines from (left, top, width, height, word) tuples: words whose
+    vertical centres are within half a line height of each other share a line.
+    """
+    if not words:
+        return ""
+    words = sorted(words, key=lambda word: word[1] + word[3] / 2)
+    line_height = max(1, sorted(word[3] for word in words)[len(words) // 2])
+
+    lines = []
+    for word in words:
+        centre = word[1] + word[3] / 2
+        if lines and abs(centre - lines[-1]["centre"]) <= line_height / 2:
+            lines[-1]["words"].append(word)
+        else:
+            lines.append({"centre": centre, "words": [word]})
+
+    return "\n".join(
+        " ".join(word[4] for word in sorted(line["words"], key=lambda word: word[0]))
+        for line in lines
+    )
+
+def _text_with_conf(data):
+    """
+    Text of an image_to_data result laid out like image_to_string's (words of
+    a line joined by spaces, lines by newlines), and its mean word confidence.
+    """
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        try:
+            conf = float(data['conf'][i])
+        except ValueError:
+            conf = 0.0
+        confidences.append(max(conf, 0.0))
+    text = "\n".join(" ".join(words) for words in lines.values())
+    return text, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+
+@timed
+def extract_seq(image, layout=None): 
+    layout = layout or BoxLayout(image)
+
+    # Crop rough box area (from the uncleaned box: remove_boxes blanks the serial box)
+    sequence_img = layout.roi("serial", clean=False)
 
     # Binary inverse for contour detection
-    _, binary = cv2.threshold(gray, 180, 255, cv2.THRESH_BINARY_INV)
+    _, binary = cv2.threshold(sequence_img, 180, 255, cv2.THRESH_BINARY_INV)
     contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
     # Find largest box
@@ -334,27 +447,33 @@ def extract_seq(image):
     # Resize for better OCR (2x)
     digit_roi = cv2.resize(digit_roi, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
 
-    # Convert to grayscale and binary
-    gray = cv2.cvtColor(digit_roi, cv2.COLOR_BGR2GRAY) if len(digit_roi.shape) == 3 else digit_roi
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Binary
+    _, thresh = cv2.threshold(digit_roi, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
     # Clean thin lines (box remnants)
     kernel = np.ones((2, 2), np.uint8)
     processed = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
 
+    text = read_digits("serial", processed)
+    if text:
+        return text
+
     # cv2.imwrite("sequence.jpg", processed)
 
 
 
     # OCR config
+    # First config through image_to_data, so the read comes with the word
+    # confidences needed to decide whether it may become a template
     config = "--oem 3 --psm 6"
-    text = pytesseract.image_to_string(processed, config=config).strip()
+    text, conf = _text_with_conf(image_to_data(processed, config=config))
+    learn_digits("serial", processed, text, conf)
     if not text:
         config = "--oem 3 --psm 11"
-        text = pytesseract.image_to_string(processed, config=config).strip()
+        text = image_to_string(processed, config=config).strip()
     if not text:
         config = "--oem 1 --psm 6"
-        text = pytesseract.image_to_string(processed, config=config).strip()
+        text = image_to_string(processed, config=config).strip()
 
 
     text = text.replace('S', '5') \
@@ -373,59 +492,119 @@ def extract_seq(image):
 
 
 
-def extract_voterId_2(image):
-    h, w = image.shape[:2]
-    voterId_img = image[int(0.04 * h):int(0.18 * h), int(0.6 * w):int(0.98 * w)]
+# Best configs for single line alphanumeric strings, in their default order
+VOTER_ID_CONFIGS = [
+    '--oem 3 --psm 7',
+    '--oem 3 --psm 6',
+    '--oem 1 --psm 7',
+    '--oem 1 --psm 8',
+    '--oem 3 --psm 13',
+    '--oem 1 --psm 6',
+    '--oem 1 --psm 11',
+    '--oem 1 --psm 12',
+    '--oem 1 --psm 9'
+]
 
-    gray = cv2.cvtColor(voterId_img, cv2.COLOR_BGR2GRAY)
-    resized = cv2.resize(gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    _, thresh = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    # Patterns
-    pattern1 = re.compile(r'^[A-Z]{3}[0-9]{7}$')
-    pattern2 = re.compile(r'^[A-Z]{2}/[0-9]{2}/[0-9]{3}/[0-9]{6}$')
+@timed
+def extract_voterId_2(image, layout=None, configs=None, prefixes=None, trace=None):
+    """
+    Read the voter ID, trying configs in order until one gives a valid EPIC.
+
+    `configs` is the order to try (VoterIdConfigStats.order() for the current
+    roll); a read that is one or two ambiguous characters off (O/0, I/1, S/5)
+    is repaired from its per-character confidences and the roll's known EPIC
+    `prefixes` instead of re-running OCR.
+    If `trace` is a dict, the configs tried, the winner and the raw reads are
+    recorded in it.
+    """
+    layout = layout or BoxLayout(image)
+    thresh = layout.binarized("voterId", 3)
 
-    # Best configs for single line alphanumeric strings
-    config_list = [
-        '--oem 3 --psm 7',
-        '--oem 3 --psm 6',
-        '--oem 1 --psm 7',
-        '--oem 1 --psm 8',
-        '--oem 3 --psm 13',
-        '--oem 1 --psm 6',
-        '--oem 1 --psm 11',
-        '--oem 1 --psm 12',
-        '--oem 1 --psm 9'
-    ]
-    text = ""
+    tried = []
+    reads = []
     cleaned = ""
-    for config in config_list:
-        text = pytesseract.image_to_string(thresh, lang='eng', config=config).strip()
+    winner = None
+    for config in configs or VOTER_ID_CONFIGS:
+        tried.append(config)
+        symbols = image_to_symbols(thresh, lang='eng', config=config)
+
+        # Remove lowercase and unwanted characters (allow only A-Z, 0-9, /)
+        cleaned, confidences = clean_symbols(symbols)
+        lenient, lenient_confidences = clean_symbols(symbols, keep_lowercase=True)
+        reads.append([lenient, lenient_confidences])
+
+        # Check for valid pattern, or a confident fix for a near miss
+        winner = repair_epic(cleaned, confidences, prefixes=prefixes)
+        if not winner and is_valid_epic(cleaned):
+            winner = cleaned
+        if not winner and lenient != cleaned:
+            winner = repair_epic(lenient, lenient_confidences, prefixes=prefixes)
+            if not winner and is_valid_epic(lenient):
+                winner = lenient
+
+        if winner:
+            break
+
+    count("extract_voterId_2.configs", len(tried))
+    if winner and winner != cleaned:
+        count("extract_voterId_2.repaired")
+
+    if trace is not None:
+        trace["voterId"] = {
+            "tried": tried,
+            "config": config if winner else None,
+            "repaired": bool(winner) and winner != cleaned,
+            "reads": reads,
+        }
+
+    if winner:
+        return winner
+
+    # If no valid pattern found, return the last cleaned read
+    return cleaned
 
-        # Remove lowercase and unwanted characters (allow only A-Z, 0-9, /, -)
-        cleaned = re.sub(r'[a-z]', '', text)                   # remove lowercase
-        cleaned = re.sub(r'[^A-Z0-9/]', '', cleaned)          # allow only valid characters
-        cleaned = cleaned.replace(" ", "")                     # remove spaces
 
-        # Check for valid pattern
-        if pattern1.fullmatch(cleaned) or pattern2.fullmatch(cleaned):
-            return cleaned
+class VoterIdConfigStats:
+    """
+    Per-roll success statistics for the voter ID configs.
 
-    # If no valid pattern found, return empty string
-    return cleaned
+    order() puts the config with the best success rate so far first, so on a
+    roll where e.g. '--oem 1 --psm 7' is the one that works, later boxes stop
+    paying for the configs that keep failing in front of it. Unseen configs
+    keep their default order.
+    """
+
+    def __init__(self, configs=VOTER_ID_CONFIGS):
+        self.configs = list(configs)
+        self.tries = dict.fromkeys(self.configs, 0)
+        self.wins = dict.fromkeys(self.configs, 0)
 
+    def record(self, trace):
+        voter_id = (trace or {}).get("voterId")
+        if not voter_id:
+            return
+        for config in voter_id["tried"]:
+            if config in self.tries:
+                self.tries[config] += 1
+        if voter_id["config"] in self.wins:
+            self.wins[voter_id["config"]] += 1
 
+    def order(self):
+        def score(item):
+            index, config = item
+            # Laplace-smoothed success rate; ties keep the default order
+            return (-(self.wins[config] + 1) / (self.tries[config] + 2), index)
+        return [config for _, config in sorted(enumerate(self.configs), key=score)]
 
 
 
 
-def extract_voterId(image):
-    h, w = image.shape[:2]
-    voterId_img = image[int(0.04 * h):int(0.18 * h), int(0.6 * w):int(0.98 * w)]
 
-    gray = cv2.cvtColor(voterId_img, cv2.COLOR_BGR2GRAY)
-    resized = cv2.resize(gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-    _, thresh = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+@timed
+def extract_voterId(image, layout=None):
+    layout = layout or BoxLayout(image)
+    thresh = layout.binarized("voterId", 3)
 
     # Patterns
     pattern1 = re.compile(r'^[A-Z]{3}[0-9]{7}$')
@@ -442,7 +621,7 @@ def extract_voterId(image):
     text = ""
     cleaned = ""
     for config in config_list:
-        text = pytesseract.image_to_string(thresh, lang='eng', config=config).strip()
+        text = image_to_string(thresh, lang='eng', config=config).strip()
 
         # Remove lowercase and unwanted characters (allow only A-Z, 0-9, /, -)
         cleaned = re.sub(r'[a-z]', '', text)                   # remove lowercase
@@ -462,27 +641,23 @@ def extract_voterId(image):
 
 
 
-def extract_houseNumber(image):
-    h, w = image.shape[:2]
-    house_img = image[int(0.47*h):int(0.59*h), int(0.226*w):int(0.5*w)]
+@timed
+def extract_houseNumber(image, layout=None):
+    layout = layout or BoxLayout(image)
 
-    # Preprocessing
-    gray = cv2.cvtColor(house_img, cv2.COLOR_BGR2GRAY)
+    # 4x upscale to improve clarity of thin characters like '1', slight blur to
+    # smooth artifacts, then Otsu
+    thresh = layout.binarized("house", 4, blur=True)
 
-    # Resize to improve clarity of thin characters like '1'
-    resized = cv2.resize(gray, None, fx=4, fy=4, interpolation=cv2.INTER_CUBIC)
-
-    # Slight blur to smooth artifacts
-    blurred = cv2.GaussianBlur(resized, (3, 3), 0)
-
-    # Thresholding
-    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    text = read_digits("house", thresh)
+    if text:
+        return text
 
     # OCR Config (treat as digits-only mode)
     config = '--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789'
 
     # Use image_to_data to get word-level confidence
-    data = pytesseract.image_to_data(thresh, lang='eng', config=config, output_type=pytesseract.Output.DICT)
+    data = image_to_data(thresh, lang='eng', config=config)
 
     text = ""
     confidences = []
@@ -515,24 +690,26 @@ def extract_houseNumber(image):
     if avg_conf < 70:
         # print(f"[LOW CONFIDENCE] House Number: '{text}' at {avg_conf}%")
         text = ""
+    else:
+        learn_digits("house", thresh, text, avg_conf)
 
     return text
 
 
 
-def extract_age(image):
-    h, w = image.shape[:2]
-    age_img = image[int(0.58*h):int(0.7*h), int(0.12*w):int(0.17*w)]
+@timed
+def extract_age(image, layout=None):
+    layout = layout or BoxLayout(image)
+    thresh = layout.binarized("age", 3)
 
-    gray = cv2.cvtColor(age_img, cv2.COLOR_BGR2GRAY)
-    resized = cv2.resize(gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-
-    _, thresh = cv2.threshold(resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    text = read_digits("age", thresh)
+    if text:
+        return text
 
     config = '--oem 3 --psm 11'
 
     # Use image_to_data for confidence
-    data = pytesseract.image_to_data(thresh, lang='eng', config=config, output_type=pytesseract.Output.DICT)
+    data = image_to_data(thresh, lang='eng', config=config)
 
     text = ""
     confidences = []
@@ -552,16 +729,16 @@ def extract_age(image):
     if(avg_conf<70):
         # print(f"Age Extracted : {text}, Confidence: {avg_conf}%")
         text = ""
+    else:
+        learn_digits("age", thresh, text, avg_conf)
 
     return text
 
 
-def extract_age_fallback_1_sensitive(image):
-    h, w = image.shape[:2]
-    age_img = image[int(0.58*h):int(0.7*h), int(0.12*w):int(0.17*w)]
-
-    # Grayscale
-    gray = cv2.cvtColor(age_img, cv2.COLOR_BGR2GRAY)
+@timed
+def extract_age_fallback_1_sensitive(image, layout=None):
+    layout = layout or BoxLayout(image)
+    gray = layout.roi("age")
 
     # CLAHE for local contrast enhancement
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
@@ -588,7 +765,7 @@ def extract_age_fallback_1_sensitive(image):
     ]
 
     for config in configs:
-        text = pytesseract.image_to_string(thresh, lang='eng', config=config).strip()
+        text = image_to_string(thresh, lang='eng', config=config).strip()
 
         # Clean common misreads
         text = text.replace('I', '1').replace('l', '1').replace('|', '1')
@@ -0,0 +1,124 @@
+import os
+import time
+
+import numpy as np
+
+from config import PAGE_CACHE_DIR, PAGE_CACHE_MAX_MB
+
+
+class PageCache:
+    """
+    Rasterized pages kept on disk as raw BGR .npy files, keyed by PDF content
+    hash, page number and DPI.
+
+    A cached page is opened as a read-only memory map: no poppler run, no PNG
+    decode and no copy, the OS pages the pixels in as the cropper touches them.
+    The cache is bounded to `max_bytes`; pages used least recently go first.
+    """
+
+    # Don't bump a file's mtime on every hit, only when it has gone stale
+    TOUCH_AFTER = 60
+    EVICT_CHECK_EVERY = 20
+
+    def __init__(self, root, max_bytes):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.max_bytes = max_bytes
+        self._puts = 0
+
+    def path(self, pdf_hash, page_num, dpi):
+        return os.path.join(self.root, pdf_hash, f"p{page_num:05d}_{dpi}dpi.npy")
+
+    def get(self, pdf_hash, page_num, dpi):
+        """
+        Memory-mapped page image, or None when the page is not cached.
+        """
+        path = self.path(pdf_hash, page_num, dpi)
+        try:
+            image = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.TOUCH_AFTER:
+                os.utime(path)
+        except OSError:
+            pass
+        # Plain ndarray view on the map, so it pickles to workers like any page
+        return np.asarray(image)
+
+    def put(self, pdf_hash, page_num, dpi, image):
+        path = self.path(pdf_hash, page_num, dpi)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write under a temporary name and rename, so a reader never maps a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(image))
+        os.replace(tmp_path, path)
+
+        self._puts += 1
+        if self._puts % self.EVICT_CHECK_EVERY == 0:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith('.npy'):
+                    continue
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Delete least recently used pages until the cache is under 90% of its limit.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped by a reader (Windows); it goes on a later pass
+                continue
+            total -= size
+
+        for folder, subfolders, files in os.walk(self.root, topdown=False):
+            if folder != self.root and not subfolders and not files:
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    pass
+
+
+_cache = None
+_cache_failed = False
+
+
+def get_page_cache():
+    """
+    The page cache, or None when PAGE_CACHE_DIR is not set.
+    """
+    global _cache, _cache_failed
+    if not PAGE_CACHE_DIR or _cache_failed:
+        return None
+    if _cache is None:
+        try:
+            _cache = PageCache(PAGE_CACHE_DIR, int(PAGE_CACHE_MAX_MB * 1024 * 1024))
+        except OSError as e:
+            print(f"[WARNING] Page cache disabled: {e}")
+            _cache_failed = True
+            return None
+    return _cache
@@ -1,9 +1,8 @@
-def crop_10x3_grid(page_img):
+def grid_geometry(h, w):
     """
-    Given a full-page OpenCV image, return a list of cropped 10x3 entry boxes.
+    Position of the 10x3 voter grid on a page of size (h, w):
+    returns (top_offset, side_offset, box_h, box_w) in pixels.
     """
-    h, w, _ = page_img.shape
-
     top_offset = int(h * 0.03)
     bottom_offset = int(h * 0.026)
     usable_height = h - top_offset - bottom_offset
@@ -12,6 +11,16 @@ def crop_10x3_grid(page_img):
 
     box_h = usable_height // 10
     box_w = usable_width // 3
+    return top_offset, side_offset, box_h, box_w
+
+
+def crop_10x3_grid(page_img):
+    """
+    Given a full-page OpenCV image, return a list of cropped 10x3 entry boxes.
+    Each box image is a view of the page; "bounds" is its (y1, y2, x1, x2).
+    """
+    h, w, _ = page_img.shape
+    top_offset, side_offset, box_h, box_w = grid_geometry(h, w)
 
     boxes = []
     for row in range(10):
@@ -23,6 +32,29 @@ def crop_10x3_grid(page_img):
             boxes.append({
                 "row": row + 1,
                 "col": col + 1,
-                "image": page_img[y1:y2, x1:x2]
+                "image": page_img[y1:y2, x1:x2],
+                "bounds": (y1, y2, x1, x2),
             })
     return boxes
+
+
+def find_empty_cells(page_img, min_ink_ratio=0.005):
+    """
+    Flag grid cells that carry (almost) no ink, in crop_10x3_grid order.
+
+    All 30 cells are checked in one numpy pass over a view of the page: the
+    text area of each cell (inside the frame, below the serial box, left of the
+    photo) is thresholded and its dark-pixel ratio compared to `min_ink_ratio`.
+    """
+    h, w = page_img.shape[:2]
+    top_offset, side_offset, box_h, box_w = grid_geometry(h, w)
+
+    # Black text on white paper: one channel is enough and needs no conversion
+    gray = page_img if page_img.ndim == 2 else page_img[:, :, 1]
+    grid = gray[top_offset:top_offset + 10 * box_h, side_offset:side_offset + 3 * box_w]
+    cells = grid.reshape(10, box_h, 3, box_w)
+
+    text_area = cells[:, int(0.22 * box_h):int(0.95 * box_h), :, int(0.05 * box_w):int(0.7 * box_w)]
+    ink_ratio = (text_area < 128).mean(axis=(1, 3))
+
+    return (ink_ratio < min_ink_ratio).reshape(-1)
@@ -4,8 +4,15 @@ import numpy as np
 
 
 def remove_boxes(image):
-    h, w = image.shape[:2]
-    result = image.copy()
+    return blank_boxes(image.copy())
+
+
+def blank_boxes(result):
+    """
+    In-place version of remove_boxes: whiten the serial box, photo and frame of
+    a voter box (or a view of one inside a page).
+    """
+    h, w = result.shape[:2]
 
     # --- Step 1: Fill inner boxes with white ---
 
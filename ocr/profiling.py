@@ -0,0 +1,232 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Profile:
+    """
+    Wall time and call counts per stage, plus free-form counters.
+
+    One Profile is active per process while profiling is on (see enable()).
+    Stages are recorded from any thread; worker processes hand theirs back with
+    take() and the parent folds them in with merge().
+    """
+
+    def __init__(self):
+        self.timings = {}       # stage -> [calls, total seconds, max seconds]
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, calls=1):
+        with self._lock:
+            timing = self.timings.get(stage)
+            if timing is None:
+                timing = self.timings[stage] = [0, 0.0, 0.0]
+            timing[0] += calls
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds / max(1, calls))
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timings": {stage: list(timing) for stage, timing in self.timings.items()},
+                "counters": dict(self.counters),
+            }
+
+    def merge(self, snapshot):
+        if not snapshot:
+            return
+        with self._lock:
+            for stage, (calls, seconds, longest) in snapshot.get("timings", {}).items():
+                timing = self.timings.get(stage)
+                if timing is None:
+                    timing = self.timings[stage] = [0, 0.0, 0.0]
+                timing[0] += calls
+                timing[1] += seconds
+                timing[2] = max(timing[2], longest)
+            for name, n in snapshot.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def rows(self):
+        """
+        One row per stage, slowest total first.
+        """
+        rows = []
+        for stage, (calls, seconds, longest) in self.snapshot()["timings"].items():
+            rows.append({
+                "stage": stage,
+                "calls": calls,
+                "total_sec": round(seconds, 4),
+                "mean_ms": round(seconds / calls * 1000, 3) if calls else 0.0,
+                "max_ms": round(longest * 1000, 3),
+            })
+        return sorted(rows, key=lambda row: -row["total_sec"])
+
+    def report(self):
+        return {
+            "wall_sec": round(time.time() - self.started, 3),
+            "stages": self.rows(),
+            "counters": dict(sorted(self.snapshot()["counters"].items())),
+        }
+
+    def write(self, path_prefix):
+        """
+        Write the profile as <path_prefix>.json and <path_prefix>.csv.
+        """
+        if os.path.dirname(path_prefix):
+            os.makedirs(os.path.dirname(path_prefix), exist_ok=True)
+        report = self.report()
+        with open(path_prefix + ".json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        with open(path_prefix + ".csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["stage", "calls", "total_sec", "mean_ms", "max_ms"])
+            writer.writeheader()
+            writer.writerows(report["stages"])
+            for name, n in report["counters"].items():
+                writer.writerow({"stage": f"counter:{name}", "calls": n})
+        return path_prefix + ".json", path_prefix + ".csv"
+
+    def live_summary(self):
+        """
+        One-line digest for log_callback: boxes/sec, Tesseract calls per box,
+        cache hit rate and voter ID configs per box.
+        """
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        boxes = counters.get("boxes", 0)
+        elapsed = max(1e-9, time.time() - self.started)
+        calls = sum(n for name, n in counters.items() if name.startswith("tesseract.") and not name.endswith(".run"))
+        runs = sum(n for name, n in counters.items() if name.startswith("tesseract.") and name.endswith(".run"))
+
+        parts = [f"{boxes} boxes", f"{boxes / elapsed:.2f} boxes/s"]
+        if boxes:
+            parts.append(f"{calls / boxes:.1f} OCR calls/box")
+            parts.append(f"{counters.get('extract_voterId_2.configs', 0) / boxes:.2f} voterId configs/box")
+        if calls:
+            parts.append(f"cache hits {100 * (calls - runs) / calls:.0f}%")
+        slowest = self.rows()[:3]
+        if slowest:
+            parts.append("top: " + ", ".join(f"{row['stage']} {row['total_sec']:.1f}s" for row in slowest))
+        return " | ".join(parts)
+
+
+# Active profile of this process (None = profiling off). Stored with the pid
+# that created it, so a forked worker starts from an empty profile instead of
+# a copy of the parent's.
+_active = None
+_active_pid = None
+
+# Per-thread override set by using(), for when several PDFs share a process
+_local = threading.local()
+
+
+def enable(on=True):
+    """
+    Turn profiling on (or off) for this process. Turning it on while it is
+    already on keeps the current profile.
+    """
+    global _active, _active_pid
+    if not on:
+        _active = _active_pid = None
+    elif _active is None or _active_pid != os.getpid():
+        _active, _active_pid = Profile(), os.getpid()
+    return _active
+
+
+def active():
+    profile = getattr(_local, "profile", None)
+    if profile is not None:
+        return profile
+    if _active is not None and _active_pid == os.getpid():
+        return _active
+    return None
+
+
+@contextmanager
+def using(profile):
+    """
+    Record into `profile` on this thread for the duration of the block (no
+    change when `profile` is None).
+    """
+    if profile is None:
+        yield
+        return
+    previous = getattr(_local, "profile", None)
+    _local.profile = profile
+    try:
+        yield
+    finally:
+        _local.profile = previous
+
+
+def take():
+    """
+    Snapshot of this process's profile, which is then reset. Worker tasks
+    return this so the parent can merge() it. None when profiling is off.
+    """
+    profile = active()
+    if profile is None:
+        return None
+    snapshot = profile.snapshot()
+    enable(False)
+    enable()
+    return snapshot
+
+
+def record(stage, seconds, calls=1):
+    profile = active()
+    if profile is not None:
+        profile.add(stage, seconds, calls)
+
+
+def count(name, n=1):
+    profile = active()
+    if profile is not None:
+        profile.count(name, n)
+
+
+def merge(snapshot):
+    profile = active()
+    if profile is not None:
+        profile.merge(snapshot)
+
+
+@contextmanager
+def stage(name):
+    if active() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(func):
+    """
+    Record the wall time and call count of `func` under its name while
+    profiling is on; a plain call otherwise.
+    """
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if active() is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+
+    return wrapper
@@ -0,0 +1,292 @@
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+from pdf2image import convert_from_path
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ContentStream
+
+from .page_cropper import grid_geometry
+from .profiling import record, count, active, using
+from .utils import file_sha256
+
+
+_DONE = object()
+
+# An embedded scan is used as is when its resolution is at least this share of
+# the requested DPI; anything coarser is rendered by poppler like other pages
+EMBEDDED_MIN_DPI_RATIO = 0.9
+
+
+def rasterize_pages(pdf_path, first_page, last_page, dpi=300, poppler_path=None):
+    """
+    Rasterize an inclusive 1-based page range and return BGR images.
+    """
+    pages = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
+        poppler_path=poppler_path,
+    )
+    return [cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR) for page in pages]
+
+
+def page_size(page, dpi=300):
+    """
+    (height, width) in pixels of a PyPDF2 page rendered at `dpi`.
+    """
+    box = page.cropbox
+    return round(float(box.height) * dpi / 72), round(float(box.width) * dpi / 72)
+
+
+def render_region(pdf_path, page_num, x, y, width, height, dpi=300, poppler_path=None):
+    """
+    Render one rectangle of a page (pixel coordinates at `dpi`) with pdftoppm's
+    crop options, read back as PPM from stdout. Only the rectangle is rasterized.
+    """
+    pdftoppm = "pdftoppm.exe" if sys.platform.startswith("win") else "pdftoppm"
+    if poppler_path:
+        pdftoppm = os.path.join(poppler_path, pdftoppm)
+    command = [
+        pdftoppm, "-f", str(page_num), "-l", str(page_num), "-r", str(dpi),
+        "-x", str(x), "-y", str(y), "-W", str(width), "-H", str(height),
+        "-singlefile", pdf_path,
+    ]
+    start = time.perf_counter()
+    ppm = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+    image = cv2.imdecode(np.frombuffer(ppm, np.uint8), cv2.IMREAD_COLOR)
+    record("render_region", time.perf_counter() - start)
+    if image is None:
+        raise RuntimeError(f"pdftoppm returned no image for page {page_num}")
+    return image
+
+
+def render_box(pdf_path, page_num, row, col, size, dpi=300, poppler_path=None):
+    """
+    Grid cell (row, col), 1-based, of a page whose full render at `dpi` is
+    `size` = (height, width): the same pixels crop_10x3_grid would cut from it.
+    """
+    top_offset, side_offset, box_h, box_w = grid_geometry(*size)
+    x = side_offset + (col - 1) * box_w
+    y = top_offset + (row - 1) * box_h
+    return render_region(pdf_path, page_num, x, y, box_w, box_h, dpi=dpi, poppler_path=poppler_path)
+
+
+def _draws_only(page, name, tolerance=0.5):
+    """
+    True when the page's content stream is exactly `q <cm> /name Do Q`, with a
+    `cm` that maps the image upright onto the whole crop box (within
+    `tolerance` points): nothing else is painted and the scan is neither
+    flipped, rotated nor placed on part of the page.
+    """
+    contents = page.get_contents()
+    if contents is None:
+        return False
+    if not isinstance(contents, ContentStream):
+        contents = ContentStream(contents, page.pdf)
+    operations = contents.operations
+    if [operator for _, operator in operations] != [b"q", b"cm", b"Do", b"Q"]:
+        return False
+    if operations[2][0] != [name]:
+        return False
+
+    a, b, c, d, e, f = (float(value) for value in operations[1][0])
+    box = page.cropbox
+    left, bottom = (float(value) for value in box.lower_left)
+    expected = (float(box.width), 0, 0, float(box.height), left, bottom)
+    return all(abs(value - want) <= tolerance for value, want in zip((a, b, c, d, e, f), expected))
+
+
+def embedded_page_image(page, dpi=300):
+    """
+    For a page that is nothing but one scanned JPEG, decode that JPEG straight
+    from the PDF stream and return it as a BGR image at `dpi`. Returns None for
+    any other page (text, vector content, several images, unusual colour
+    handling, too low a resolution), which then goes through poppler.
+    """
+    try:
+        if int(page.get("/Rotate", 0) or 0) % 360:
+            return None
+        resources = page.get("/Resources")
+        resources = resources.get_object() if resources is not None else {}
+        if "/Font" in resources or "/XObject" not in resources:
+            return None
+        xobjects = resources["/XObject"].get_object()
+        if len(xobjects) != 1:
+            return None
+
+        name, xobj = next(iter(xobjects.items()))
+        xobj = xobj.get_object()
+        filters = xobj.get("/Filter")
+        if isinstance(filters, list):
+            filters = filters[0] if len(filters) == 1 else None
+        if xobj.get("/Subtype") != "/Image" or filters != "/DCTDecode":
+            return None
+        if "/Decode" in xobj or "/SMask" in xobj or "/Mask" in xobj or xobj.get("/ColorSpace") == "/DeviceCMYK":
+            return None
+        if not _draws_only(page, name):
+            return None
+
+        # DCT streams are passed through undecoded by PyPDF2, so this is the JPEG file itself
+        image = cv2.imdecode(np.frombuffer(xobj.get_data(), np.uint8), cv2.IMREAD_COLOR)
+        box = page.cropbox
+        width_in, height_in = float(box.width) / 72, float(box.height) / 72
+    except Exception:
+        # Anything out of the ordinary in the page structure: let poppler handle it
+        return None
+    if image is None:
+        return None
+
+    # The scan has to fill the page and be sharp enough to stand in for a render
+    h, w = image.shape[:2]
+    target = (round(width_in * dpi), round(height_in * dpi))
+    if abs(w / h - target[0] / target[1]) > 0.01 * target[0] / target[1]:
+        return None
+    if w / width_in < dpi * EMBEDDED_MIN_DPI_RATIO:
+        return None
+
+    # Geometry downstream is tuned for `dpi`, so match poppler's output size
+    if (w, h) != target:
+        image = cv2.resize(image, target, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _page_windows(page_numbers, window):
+    """
+    Split page numbers into runs of consecutive pages, at most `window` long,
+    so each run can be rendered with a single poppler call.
+    """
+    run = []
+    for page_num in page_numbers:
+        if run and (page_num != run[-1] + 1 or len(run) >= window):
+            yield run
+            run = []
+        run.append(page_num)
+    if run:
+        yield run
+
+
+def _render(pdf_path, page_numbers, dpi, window, poppler_path, page_cache=None, pdf_hash=None, reader=None):
+    """
+    (page_num, bgr_image) for a run of consecutive pages: cached pages come
+    from the page cache, pages that are a single embedded JPEG are decoded
+    directly when a PdfReader is given, and the rest are rendered by poppler
+    (in windows) and stored in the cache.
+    """
+    images = {}
+    if page_cache is not None:
+        for page_num in page_numbers:
+            image = page_cache.get(pdf_hash, page_num, dpi)
+            if image is not None:
+                images[page_num] = image
+                count("page_cache.hit")
+
+    if reader is not None:
+        for page_num in page_numbers:
+            if page_num in images:
+                continue
+            start = time.perf_counter()
+            image = embedded_page_image(reader.pages[page_num - 1], dpi)
+            if image is not None:
+                # Decoding is cheaper than writing 25 MB to the cache, so these are not cached
+                images[page_num] = image
+                record("embedded_page", time.perf_counter() - start)
+
+    missing = [page_num for page_num in page_numbers if page_num not in images]
+    for run in _page_windows(missing, max(1, window)):
+        start = time.perf_counter()
+        rendered = rasterize_pages(pdf_path, run[0], run[-1], dpi=dpi, poppler_path=poppler_path)
+        # One poppler call renders the whole window, so it is timed per window
+        # (not comparable with the per-page stages); the pages are counted
+        record("rasterize_window", time.perf_counter() - start)
+        count("rasterize_window.pages", len(run))
+        for page_num, image in zip(run, rendered):
+            if page_cache is not None:
+                count("page_cache.miss")
+                try:
+                    page_cache.put(pdf_hash, page_num, dpi, image)
+                except OSError as e:
+                    print(f"[WARNING] Page {page_num} not cached: {e}")
+            images[page_num] = image
+
+    return [(page_num, images[page_num]) for page_num in page_numbers]
+
+
+def load_page(pdf_path, page_num, dpi=300, poppler_path=None, page_cache=None, pdf_hash=None, embedded=True):
+    """
+    One page as a BGR image, from the page cache when it is there. Meant for
+    looking at single pages and boxes without re-rendering the PDF every time.
+    """
+    if page_cache is not None and pdf_hash is None:
+        pdf_hash = file_sha256(pdf_path)
+    reader = PdfReader(pdf_path) if embedded else None
+    return _render(pdf_path, [page_num], dpi, 1, poppler_path, page_cache, pdf_hash, reader)[0][1]
+
+
+def iter_pages(pdf_path, page_numbers, dpi=300, window=2, prefetch=2, poppler_path=None, page_cache=None, pdf_hash=None,
+               embedded=True):
+    """
+    Yield (page_num, bgr_image) for each requested page, in order.
+
+    A background thread rasterizes `window` pages at a time and parks them in a
+    queue holding at most `prefetch` pages, so memory stays fixed however long
+    the roll is and the caller can start OCR on the first page right away.
+    With a `page_cache` (ocr.page_cache.PageCache), pages rendered before at
+    this DPI are memory-mapped from disk instead of going through poppler.
+    With `embedded`, pages that only wrap one scanned JPEG are decoded from the
+    PDF directly (embedded_page_image); poppler stays the fallback.
+    """
+    if page_cache is not None and pdf_hash is None:
+        pdf_hash = file_sha256(pdf_path)
+
+    pages = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    # The producer thread records into the caller's profile
+    profile = active()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        with using(profile):
+            produce_pages()
+
+    def produce_pages():
+        try:
+            reader = PdfReader(pdf_path) if embedded else None
+            for run in _page_windows(page_numbers, max(1, window)):
+                images = _render(pdf_path, run, dpi, window, poppler_path, page_cache, pdf_hash, reader)
+                for item in images:
+                    if not put(item):
+                        return
+                del images
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
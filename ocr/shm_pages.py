@@ -0,0 +1,103 @@
+import os
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# What a worker task gets instead of pixels: the shared-memory slot holding the
+# page, the page's shape and dtype, and the (y1, y2, x1, x2) region of it to use
+# (None = the whole page)
+PageRef = namedtuple("PageRef", "slot shape dtype bounds")
+
+
+class PageRing:
+    """
+    Fixed set of shared-memory slots that rendered pages are copied into once,
+    so OCR worker processes can read their boxes without any pickling.
+
+    All slots are sized for the first page stored; a page that does not fit,
+    or arrives while every slot is busy, is not shared and the caller falls
+    back to sending pixels. A slot is reused once release() is called for it.
+    """
+
+    def __init__(self, slots):
+        self.slots = max(1, slots)
+        self.slot_bytes = None
+        self._free = []
+        self._segments = {}     # name -> SharedMemory
+
+    def put(self, image):
+        """
+        Copy `image` into a free slot. Returns (view, PageRef) where `view` is
+        the page as stored in the slot, or (image, None) when it was not shared.
+        """
+        if self.slot_bytes is None:
+            self.slot_bytes = image.nbytes
+            for _ in range(self.slots):
+                segment = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                self._segments[segment.name] = segment
+                self._free.append(segment.name)
+        if image.nbytes > self.slot_bytes or not self._free:
+            return image, None
+
+        name = self._free.pop()
+        view = np.ndarray(image.shape, dtype=image.dtype, buffer=self._segments[name].buf)
+        view[...] = image
+        return view, PageRef(name, image.shape, image.dtype.str, None)
+
+    def release(self, ref):
+        if ref is not None and ref.slot in self._segments and ref.slot not in self._free:
+            self._free.append(ref.slot)
+
+    def close(self):
+        for segment in self._segments.values():
+            try:
+                segment.close()
+            except BufferError:
+                # The caller still holds boxes of a page; the mapping goes with the process
+                pass
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments.clear()
+        self._free.clear()
+
+
+def box_ref(page_ref, bounds):
+    return page_ref._replace(bounds=bounds)
+
+
+# Slots this worker process has attached to, kept open for the life of the pool
+# (the parent reuses the same few slots over and over)
+_attached = {}
+
+
+def _attach(name):
+    segment = _attached.get(name)
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        if os.name != "nt":
+            # The parent owns the slots: without this the worker's resource
+            # tracker would unlink them (and warn) when the worker exits
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, "shared_memory")
+        _attached[name] = segment
+    return segment
+
+
+def resolve(image):
+    """
+    Pixels for a worker task: `image` itself, or a numpy view of the shared
+    page (or of the region of it) a PageRef points to. No copy is made.
+    """
+    if not isinstance(image, PageRef):
+        return image
+    page = np.ndarray(image.shape, dtype=np.dtype(image.dtype), buffer=_attach(image.slot).buf)
+    # Other tasks read the same page: nothing may draw on it
+    page.flags.writeable = False
+    if image.bounds is None:
+        return page
+    y1, y2, x1, x2 = image.bounds
+    return page[y1:y2, x1:x2]
@@ -0,0 +1,137 @@
+import math
+import re
+
+from .epic import is_valid_epic
+from .layout import FIELD_ROIS
+from .ocr_engine_2 import parse_voter_info, devanagari_to_english_digits, _join_lines
+from .page_cropper import grid_geometry
+
+
+DEVANAGARI_RE = re.compile(r'[ऀ-ॿ]')
+
+# A page counts as having a usable text layer when it carries at least this
+# many Devanagari characters and the field labels come out as real Unicode
+# (legacy-font PDFs extract as Latin gibberish and still need OCR)
+MIN_DEVANAGARI_CHARS = 100
+LABEL_WORDS = ('नाम', 'आयु')
+
+
+def page_words(page, dpi=300):
+    """
+    Text runs of a PyPDF2 page as (left, top, width, height, text) in pixels of
+    a `dpi` render, i.e. the coordinates crop_10x3_grid would see.
+    Returns (words, (height, width)) of the page at that DPI.
+    """
+    box = page.cropbox
+    x0, top = float(box.left), float(box.top)
+    scale = dpi / 72
+    size = (round(float(box.height) * scale), round(float(box.width) * scale))
+
+    words = []
+
+    def visit(text, cm, tm, font_dict, font_size):
+        text = text.strip()
+        if not text or not cm or not tm:
+            return
+        # Text matrix in device space: tm x cm
+        a = tm[0] * cm[0] + tm[1] * cm[2]
+        b = tm[0] * cm[1] + tm[1] * cm[3]
+        c = tm[2] * cm[0] + tm[3] * cm[2]
+        d = tm[2] * cm[1] + tm[3] * cm[3]
+        e = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        f = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        height = max(1.0, (font_size or 1) * math.sqrt(abs(a * d - b * c))) * scale
+
+        left = (e - x0) * scale
+        baseline = (top - f) * scale
+        # Rough run width; only the centre is used to place it in a cell
+        width = 0.5 * height * len(text)
+        words.append((int(left), int(baseline - 0.8 * height), int(width), int(height), text))
+
+    page.extract_text(visitor_text=visit)
+    return words, size
+
+
+def has_text_layer(words):
+    text = " ".join(word[4] for word in words)
+    return len(DEVANAGARI_RE.findall(text)) >= MIN_DEVANAGARI_CHARS and all(label in text for label in LABEL_WORDS)
+
+
+def _in_rect(fx, fy, field):
+    y1, y2, x1, x2 = FIELD_ROIS[field]
+    return y1 <= fy < y2 and x1 <= fx < x2
+
+
+def text_cells(page, dpi=300):
+    """
+    Read the 30 grid cells of a born-digital page from its text layer.
+
+    Every text run is placed in the cell (and the field rectangle inside it)
+    that holds its centre, using the same grid and FIELD_ROIS as the image path.
+    Returns a list of 30 {"sequenceOCR", "result"} dicts in crop_10x3_grid
+    order, with result shaped like perform_ocr's, or None when the page has no
+    usable text layer. Blank cells come back with empty fields.
+    """
+    words, (h, w) = page_words(page, dpi)
+    if not has_text_layer(words):
+        return None
+
+    top_offset, side_offset, box_h, box_w = grid_geometry(h, w)
+    cells = [{"voterId": [], "serial": [], "text": []} for _ in range(30)]
+    for left, top, width, height, text in words:
+        cx, cy = left + width / 2, top + height / 2
+        row, col = int((cy - top_offset) // box_h), int((cx - side_offset) // box_w)
+        if not (0 <= row < 10 and 0 <= col < 3):
+            continue
+        fx = (cx - side_offset - col * box_w) / box_w
+        fy = (cy - top_offset - row * box_h) / box_h
+        cell = cells[row * 3 + col]
+        if _in_rect(fx, fy, "voterId"):
+            cell["voterId"].append((left, text))
+        elif _in_rect(fx, fy, "serial"):
+            cell["serial"].append((left, text))
+        elif fy >= FIELD_ROIS["text"][0]:
+            cell["text"].append((left, top, width, height, text))
+
+    return [_cell_result(cell) for cell in cells]
+
+
+def _cell_result(cell):
+    voter_id = re.sub(r'[^A-Z0-9/]', '', "".join(text for _, text in sorted(cell["voterId"])))
+    serial = re.sub(r'\D', '', devanagari_to_english_digits("".join(text for _, text in sorted(cell["serial"]))))
+    data = parse_voter_info(_join_lines(cell["text"]))
+
+    filled = any(data.values())
+    return {
+        "sequenceOCR": serial,
+        "result": {
+            "voterId": voter_id,
+            "name": data.get("name") or ("Name Unavailable" if filled else ""),
+            "relationName": data.get("relationName"),
+            "relation": data.get("relation"),
+            "houseNumber": data.get("houseNumber"),
+            "Age": devanagari_to_english_digits(data.get("Age") or ""),
+            "gender": data.get("gender"),
+        },
+    }
+
+
+def needs_voter_id_ocr(cell):
+    """
+    A text-layer cell whose voter ID did not come through (or not as a valid
+    EPIC) still needs the voter ID strip OCR'd from the image.
+    """
+    result = cell["result"]
+    filled = any(result.get(field) for field in ("name", "relation", "houseNumber", "Age"))
+    return filled and not is_valid_epic(result.get("voterId") or "")
+
+
+def filled_cells(cells):
+    """
+    Number of cells before the first blank one (the empty tail of the last page).
+    """
+    for index, cell in enumerate(cells):
+        result = cell["result"]
+        if not any(result.get(field) for field in ("name", "relation", "relationName", "houseNumber", "Age")):
+            return index
+    return len(cells)
@@ -35,3 +35,14 @@ def detect_gender(text):
     if contains_keyword(text, ['पुरुष']):
         return 'Male'
     return 'Male'
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Content hash of a file, used to recognise the same PDF across runs and renames.
+    """
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,473 @@
+import os
+import time
+from contextlib import nullcontext
+
+import cv2
+from PyPDF2 import PdfReader
+
+from config import (
+    POPPLER_PATH, OCR_WORKERS, RASTER_DPI, RASTER_LOW_DPI, RASTER_WINDOW, PAGES_IN_FLIGHT,
+    EMPTY_CELL_INK_RATIO, PAGE_OCR_MODE, PROFILE_DIR, PROFILE_LOG_EVERY, EMBEDDED_IMAGES,
+    TEXT_LAYER, WRITE_JSON_ARRAY, PROFILE, SHARED_MEMORY_PAGES,
+)
+from db_and_save import save_entry_to_db_and_image, get_db_writer
+from checkpoint import CheckpointStore, checkpoint_key
+from result_writer import NdjsonWriter, NdjsonEntries, finalize_json
+from scheduler import BoxScheduler, resolve_workers
+from ocr import profiling
+from ocr.epic import EpicPrefixModel, is_valid_epic, repair_from_reads
+from ocr.ocr_engine_2 import VoterIdConfigStats
+from ocr.page_cache import get_page_cache
+from ocr.page_cropper import crop_10x3_grid, find_empty_cells
+from ocr.rasterizer import iter_pages, page_size
+from ocr.text_layer import text_cells, filled_cells, needs_voter_id_ocr
+from ocr.utils import file_sha256
+
+
+class PdfJob:
+    """
+    One roll PDF going through the pipeline: checkpoint restore, page
+    submission, per-page bookkeeping (progress, DB rows, NDJSON, checkpoints)
+    and the final outputs.
+
+    The OCR itself runs on a BoxScheduler that the job does not own, so the
+    pages of several jobs can share one pool (see run_jobs). Callbacks, logs
+    and output files are the job's own, as with a standalone process_pdf run.
+    """
+
+    def __init__(self, pdf_path, progress_callback=None, log_callback=None, is_folder_processing=False,
+                 resume=True, profile=None, collect_entries=True, combined_writer=None, pages=None,
+                 output_ndjson=None, write_json=WRITE_JSON_ARRAY):
+        self.pdf_path = pdf_path
+        self.progress_callback = progress_callback
+        self.log_callback = log_callback
+        self.is_folder_processing = is_folder_processing
+        self.resume = resume
+        # None follows config.PROFILE; the job's stages are recorded into its own
+        # Profile so several jobs can share one process
+        self.profile = profiling.Profile() if (PROFILE if profile is None else profile) else None
+        self.collect_entries = collect_entries
+        self.combined_writer = combined_writer
+
+        self.pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        self.output_json = f"output/{self.pdf_name}_result.json" if write_json else None
+        self.output_ndjson = output_ndjson or f"output/{self.pdf_name}_result.ndjson"
+        self.reader = PdfReader(pdf_path)
+
+        # Voter pages are 3 .. N-1; the first two and the last page carry no voter boxes.
+        # `pages` limits the job to a shard of them (distributed mode).
+        voter_pages = range(3, len(self.reader.pages))
+        self.page_numbers = [page_num for page_num in voter_pages if pages is None or page_num in pages]
+        self.partial = len(self.page_numbers) < len(voter_pages)
+        self.total_expected_entries = len(self.page_numbers) * 30
+        self.offset = 0
+
+        self.db_config = {
+            "host": "localhost",
+            "user": "root",
+            "password": "Password@123",
+            "database": "voter_db",
+        }
+
+        # Learns which voter ID config works on this roll and tries it first
+        self.voter_id_stats = VoterIdConfigStats()
+        # Learns the roll's EPIC prefixes so near-miss IDs can be repaired without re-OCR
+        self.epic_prefixes = EpicPrefixModel()
+
+        # Two-tier rendering: pages are rasterized and OCR'd at RASTER_LOW_DPI, and
+        # only boxes that fail validation are rendered again at RASTER_DPI
+        self.two_tier = bool(RASTER_LOW_DPI) and RASTER_LOW_DPI < RASTER_DPI
+        self.render_dpi = RASTER_LOW_DPI if self.two_tier else RASTER_DPI
+
+        self.scheduler = None
+        self.results_writer = None
+        self.checkpoints = None
+        self.error = None
+        self.result = None
+        self.page_entries = {}
+        self.done_page_nums = set()
+        self.text_pages = {}
+        self.entry_count = 0
+        self.in_flight = 0
+        self.all_submitted = False
+        self.closed = False
+
+    @property
+    def page_count(self):
+        return len(self.page_numbers)
+
+    @property
+    def finished(self):
+        return self.all_submitted and self.in_flight == 0
+
+    def log(self, message, always=False):
+        if self.log_callback and (always or not self.is_folder_processing):
+            self.log_callback(message)
+
+    def start(self):
+        """
+        Open outputs and checkpoints, restore finished pages and read the text
+        layer. Call before page_submissions().
+        """
+        self.log(f"📄 Processing PDF: {self.pdf_name}", always=True)
+        os.makedirs("temp_crops", exist_ok=True)
+        self.start_time = time.time()
+
+        # # Extract Vidhan Sabha Info
+        # firstPage = convert_from_path(pdf_path, dpi=300, first_page=1, last_page=1, poppler_path=POPPLER_PATH)
+        # firstPageImg = cv2.cvtColor(np.array(firstPage[0]), cv2.COLOR_RGB2BGR)
+        # h, w = firstPageImg.shape[:2]
+        # image = firstPageImg[int(0.085 * h):int(0.11 * h), int(0.384 * w):int(0.98 * w)]
+        # os.makedirs("output/first_pages", exist_ok=True)
+        # cv2.imwrite(f"output/first_pages/{pdf_name}_firstpage.jpg", image)
+
+        # vidhansabha = extract_text(image)
+        # if log_callback:
+        #     log_callback(f"📍 Extracted Vidhan Sabha Info: {vidhansabha}")
+
+        # Entries are streamed to the NDJSON file as pages finish; they are only
+        # kept in memory as well when the caller wants the list back
+        self.results_writer = NdjsonWriter(self.output_ndjson)
+
+        # Pick up where an earlier, interrupted run of the same PDF left off
+        self.checkpoints = CheckpointStore()
+        self.pdf_hash = file_sha256(self.pdf_path)
+        self.checkpoint_key = checkpoint_key(self.pdf_hash)
+        if not self.resume:
+            # A shard only forgets its own pages: other units of the PDF may have run here
+            self.checkpoints.forget_pdf(self.checkpoint_key, self.page_numbers if self.partial else None)
+        done_pages = self.checkpoints.completed_pages(self.checkpoint_key)
+
+        if done_pages:
+            if self.checkpoints.is_pdf_done(self.checkpoint_key):
+                self.log(f"⏭️ {self.pdf_name} was already processed, loading results from checkpoint", always=True)
+            else:
+                self.log(f"⏭️ Resuming {self.pdf_name}: {len(done_pages)} page(s) already done", always=True)
+
+        for page_num in sorted(done_pages):
+            if page_num not in self.page_numbers:
+                continue
+            entries = done_pages.pop(page_num)
+            for entry in entries:
+                entry["vidhansabha"] = self.pdf_name
+                # Upserts are idempotent, so re-sending covers rows that never made it to MySQL
+                get_db_writer(self.db_config).add(entry["text"], entry["sequence"], entry["sequenceOCR"], self.pdf_name)
+            self.store_page(page_num, entries)
+            self.entry_count += len(entries)
+            if self.progress_callback:
+                self.progress_callback(self.entry_count, self.total_expected_entries, page_num - 3, 30, 30)
+
+        self.pending_pages = [page_num for page_num in self.page_numbers if page_num not in self.done_page_nums]
+
+        # Born-digital pages are read from the PDF's text layer; only pages without
+        # one, and voter IDs it did not give, are rasterized and OCR'd
+        if TEXT_LAYER:
+            for page_num in self.pending_pages:
+                with profiling.stage("text_layer_page"):
+                    try:
+                        cells = text_cells(self.reader.pages[page_num - 1], self.render_dpi)
+                    except Exception as e:
+                        print(f"[WARNING] Text layer of page {page_num} unreadable, using OCR: {e}")
+                        cells = None
+                if cells is not None:
+                    self.text_pages[page_num] = cells[:filled_cells(cells)]
+            if self.text_pages:
+                self.log(f"🔤 {len(self.text_pages)} page(s) have a text layer and skip full OCR", always=True)
+
+    def options(self):
+        return {
+            "voter_id_configs": self.voter_id_stats.order(),
+            "epic_prefixes": self.epic_prefixes.dominant(),
+            "profile": bool(self.profile),
+        }
+
+    def page_submissions(self, page_ocr=False):
+        """
+        Yield (page_index, boxes, page_gray, known, page_ref) for every page
+        still to do, text-layer pages first, then pages as they come off the
+        rasterizer. Rasterized pages are moved into the scheduler's shared
+        memory when it has a free slot (page_ref), and their boxes cut from there.
+        """
+        raster_pages = []
+        for page_num in self.pending_pages:
+            cells = self.text_pages.get(page_num)
+            if cells is None or any(needs_voter_id_ocr(cell) for cell in cells):
+                raster_pages.append(page_num)
+                continue
+            # Everything is in the text layer: no pixels needed
+            boxes = [{"row": i // 3 + 1, "col": i % 3 + 1, "image": None} for i in range(len(cells))]
+            yield page_num - 3, boxes, None, cells, None
+
+        # Pages are rasterized in the background and fed to the workers as they arrive
+        pages = iter_pages(
+            self.pdf_path, raster_pages, dpi=self.render_dpi, window=RASTER_WINDOW, poppler_path=POPPLER_PATH,
+            page_cache=get_page_cache(), pdf_hash=self.pdf_hash, embedded=EMBEDDED_IMAGES,
+        )
+        for page_num, img_cv2 in pages:
+            self.log(f"📄 Page {page_num}: Started")
+
+            img_cv2, page_ref = self.scheduler.share_page(img_cv2)
+            boxes = crop_10x3_grid(img_cv2)
+            cells = self.text_pages.get(page_num)
+            if cells is not None:
+                # Text-layer page that still needs some voter IDs read from the image
+                boxes = boxes[:len(cells)]
+            else:
+                # Blank cells (usually at the end of the last page) are found from ink
+                # density alone; everything from the first blank cell on is never OCR'd
+                empty = find_empty_cells(img_cv2, EMPTY_CELL_INK_RATIO)
+                if empty.any():
+                    first_empty = int(empty.argmax())
+                    self.log(f"⬜ Page {page_num}: {len(boxes) - first_empty} blank cell(s) skipped")
+                    boxes = boxes[:first_empty]
+
+            # A shared page is converted by the worker itself
+            needs_gray = page_ocr and cells is None and page_ref is None
+            page_gray = cv2.cvtColor(img_cv2, cv2.COLOR_BGR2GRAY) if needs_gray else None
+            del img_cv2
+            yield page_num - 3, boxes, page_gray, cells, page_ref
+
+    def store_page(self, page_num, entries):
+        self.results_writer.write_many(entries)
+        if self.combined_writer is not None:
+            self.combined_writer.write_many(entries)
+        if self.collect_entries:
+            self.page_entries[page_num] = entries
+        self.done_page_nums.add(page_num)
+
+    def second_pass(self, page_index):
+        """
+        How the scheduler renders this page's boxes again for the high-DPI
+        re-read, or None when the page gets no second pass.
+        """
+        page_num = page_index + 3
+        if not self.two_tier or page_num in self.text_pages:
+            return None
+        size = page_size(self.reader.pages[page_num - 1], RASTER_DPI)
+        return self.pdf_path, page_num, size, RASTER_DPI, POPPLER_PATH
+
+    def finish_page(self, page_index, boxes, results):
+        page_num = page_index + 3
+        entries = []
+        finish_start = time.perf_counter()
+        self.in_flight -= 1
+
+        reread = sum(1 for box_result in results if box_result.get("second_pass"))
+        if reread:
+            self.log(f"🔍 Page {page_num}: {reread} box(es) re-read at {RASTER_DPI} DPI")
+
+        for i, (box, box_result) in enumerate(zip(boxes, results)):
+            # Handle skipping and early stop based on empty fields
+            if box_result["is_empty"]:
+                self.log(f"❌ Stopping early on page {page_num} due to empty fields.")
+                break
+
+            result = box_result["result"]
+            sequenceOCR = box_result["sequenceOCR"]
+            self.voter_id_stats.record(box_result["trace"])
+
+            # Second chance for IDs the worker could not fix: the prefixes known by now
+            # may be enough to repair one of the reads it already made
+            voter_id_trace = box_result["trace"].get("voterId")
+            repaired = bool(voter_id_trace and voter_id_trace["repaired"])
+            if not is_valid_epic(result.get("voterId") or ""):
+                fixed = repair_from_reads((voter_id_trace or {}).get("reads", []),
+                                          prefixes=self.epic_prefixes.dominant())
+                if fixed:
+                    result["voterId"] = fixed
+                    repaired = True
+            # The model only learns from IDs it did not shape itself
+            confidences = None
+            if voter_id_trace is not None:
+                confidences = next((confs for text, confs in voter_id_trace["reads"]
+                                    if text == result.get("voterId")), [])
+            self.epic_prefixes.record(result.get("voterId"), confidences, repaired=repaired)
+
+            self.entry_count += 1
+            if self.progress_callback:
+                self.progress_callback(self.entry_count, self.total_expected_entries, page_index, i + 1, 30)
+
+            sequence = (page_num - 3) * 30 + (box["row"] - 1) * 3 + box["col"] - self.offset
+
+            save_entry_to_db_and_image(
+                result=result,
+                vidhansabha=self.pdf_name,
+                sequence=sequence,
+                sequenceOCR=sequenceOCR,
+                image=box["image"],
+                db_config=self.db_config,
+            )
+
+            entries.append({
+                "sequence": sequence,
+                "sequenceOCR": sequenceOCR,
+                "page": page_num,
+                "row": box["row"],
+                "col": box["col"],
+                "vidhansabha": self.pdf_name,
+                "text": result,
+            })
+
+        # Push this page's rows to MySQL without waiting for the batch to fill
+        get_db_writer(self.db_config).flush()
+
+        self.store_page(page_num, entries)
+        self.checkpoints.save_page(self.checkpoint_key, page_num, entries)
+        profiling.record("finish_page", time.perf_counter() - finish_start)
+        profiling.count("pages")
+
+        self.log(f"✅ Page {page_num}: Done ({len(entries)} entries)")
+
+        if self.profile and self.profile.counters.get("pages", 0) % max(1, PROFILE_LOG_EVERY) == 0:
+            self.log(f"📈 {self.pdf_name}: {self.profile.live_summary()}", always=True)
+
+    def close(self):
+        """
+        Write the final outputs and return (entries, page count) like process_pdf.
+        """
+        self.closed = True
+        with profiling.stage("db_flush_wait"):
+            get_db_writer(self.db_config).flush(wait=True)
+
+        self.results_writer.close()
+        if not self.partial:
+            self.checkpoints.mark_pdf_done(self.checkpoint_key, self.pdf_name, self.page_count, self.results_writer.count)
+        self.checkpoints.close()
+
+        if self.collect_entries:
+            all_entries = [entry for page_num in sorted(self.page_entries) for entry in self.page_entries[page_num]]
+        else:
+            all_entries = NdjsonEntries(self.output_ndjson, self.results_writer.count)
+
+        # Legacy array, in page order, built from the NDJSON one entry at a time
+        if self.output_json:
+            finalize_json(self.output_ndjson, self.output_json,
+                          sort_key=lambda entry: (entry["page"], entry["row"], entry["col"]))
+
+        end_time = time.time()
+        self.log(f"💾 Results saved to {self.output_ndjson}" + (f" and {self.output_json}" if self.output_json else ""),
+                 always=True)
+        self.log(f"⏱️ Execution Time: {end_time - self.start_time:.2f} sec", always=True)
+        self.log(f"📊 Total entries extracted: {len(all_entries)}", always=True)
+
+        if self.profile:
+            json_path, csv_path = self.profile.write(os.path.join(PROFILE_DIR, f"{self.pdf_name}_profile"))
+            self.log(f"📈 {self.pdf_name}: {self.profile.live_summary()}", always=True)
+            self.log(f"📈 Profile saved to {json_path} and {csv_path}", always=True)
+
+        self.result = (all_entries, self.page_count)
+        return self.result
+
+    def abort(self, error):
+        """
+        Stop a job that failed part way: its finished pages are kept (NDJSON,
+        checkpoints), the rest is dropped.
+        """
+        self.closed = True
+        self.error = error
+        if self.results_writer is not None:
+            self.results_writer.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+
+
+def pages_in_flight(max_workers):
+    """
+    Enough pages in flight to keep every worker busy, and no more.
+    """
+    return PAGES_IN_FLIGHT or max_workers // 30 + 2
+
+
+def make_scheduler(max_workers=OCR_WORKERS, on_profile=None):
+    """
+    The BoxScheduler run_jobs uses, with enough shared-memory page slots for
+    the pages in flight plus a batch of finished ones waiting to be consumed.
+    """
+    max_workers = resolve_workers(max_workers)
+    slots = 2 * pages_in_flight(max_workers) + 1 if SHARED_MEMORY_PAGES else 0
+    return BoxScheduler(max_workers=max_workers, page_ocr=PAGE_OCR_MODE == "page", on_profile=on_profile,
+                        page_slots=slots)
+
+
+def run_jobs(jobs, max_workers=OCR_WORKERS, on_job_start=None, on_job_done=None, scheduler=None):
+    """
+    Run several PdfJobs through one persistent process pool.
+
+    Jobs are started longest first (most pages), and the pages of all of them
+    go through a single queue: the next PDF's pages are submitted while the
+    previous PDF's last pages are still being OCR'd, so its slow tail no longer
+    leaves cores idle. `on_job_done(job)` is called as each job finishes, with
+    job.result set, or job.error when it failed; a failed job does not stop
+    the others. Returns the jobs in the order they ran.
+    Pass a `scheduler` to reuse a pool across calls; it is left running.
+    """
+    jobs = sorted(jobs, key=lambda job: -job.page_count)
+    page_ocr = scheduler.page_ocr if scheduler is not None else PAGE_OCR_MODE == "page"
+
+    def route_profile(page_key, snapshot):
+        job = jobs[page_key[0]]
+        if job.profile is not None:
+            job.profile.merge(snapshot)
+
+    reported = set()
+
+    def done(job):
+        if id(job) not in reported:
+            reported.add(id(job))
+            if on_job_done:
+                on_job_done(job)
+
+    def finish(job_index, page_index, boxes, results):
+        job = jobs[job_index]
+        if job.closed:
+            return
+        try:
+            with profiling.using(job.profile):
+                job.finish_page(page_index, boxes, results)
+                if job.finished:
+                    job.close()
+        except Exception as e:
+            job.abort(e)
+        if job.closed:
+            done(job)
+
+    if scheduler is None:
+        pool = make_scheduler(max_workers, on_profile=route_profile)
+    else:
+        scheduler.on_profile = route_profile
+        pool = nullcontext(scheduler)
+
+    with pool as scheduler:
+        max_in_flight = pages_in_flight(scheduler.max_workers)
+
+        for job_index, job in enumerate(jobs):
+            job.scheduler = scheduler
+            if on_job_start:
+                on_job_start(job)
+            try:
+                with profiling.using(job.profile):
+                    job.start()
+                    for page_index, boxes, page_gray, known, page_ref in job.page_submissions(page_ocr):
+                        while scheduler.pages_in_flight >= max_in_flight:
+                            for (ready_job, ready_page), ready_boxes, results in scheduler.wait_pages():
+                                finish(ready_job, ready_page, ready_boxes, results)
+                        if job.closed:
+                            scheduler.release_page(page_ref)
+                            break
+                        job.in_flight += 1
+                        scheduler.submit_page((job_index, page_index), boxes, page_gray, job.options(),
+                                              known=known, group=job_index, page_ref=page_ref,
+                                              second_pass=job.second_pass(page_index))
+                    job.all_submitted = True
+                    if job.finished and not job.closed:
+                        job.close()
+            except Exception as e:
+                job.abort(e)
+            if job.closed:
+                done(job)
+
+        # Pages come back in order per PDF, each one as soon as all of its boxes are done
+        for (job_index, page_index), boxes, results in scheduler.completed_pages():
+            finish(job_index, page_index, boxes, results)
+
+    return jobs
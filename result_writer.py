@@ -0,0 +1,111 @@
+import json
+import os
+import time
+
+from config import NDJSON_FSYNC_SECONDS
+
+
+class NdjsonWriter:
+    """
+    Streams entries to an NDJSON file, one JSON object per line, as pages finish.
+
+    Every write_many() is flushed to the OS and the file is fsynced at most
+    every `fsync_seconds`, so a crash loses at most the last few seconds of
+    results and nothing has to be held in memory until the end of a run.
+    """
+
+    def __init__(self, path, fsync_seconds=NDJSON_FSYNC_SECONDS):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fsync_seconds = fsync_seconds
+        self.count = 0
+        self._file = open(path, "w", encoding="utf-8")
+        self._last_sync = time.time()
+
+    def write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False))
+        self._file.write("\n")
+        self.count += 1
+
+    def write_many(self, entries):
+        for entry in entries:
+            self.write(entry)
+        self._file.flush()
+        if time.time() - self._last_sync >= self.fsync_seconds:
+            self.sync()
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class NdjsonEntries:
+    """
+    Read-only, list-like view of an NDJSON result file: len() and iteration
+    without loading the file into memory.
+    """
+
+    def __init__(self, path, count=None):
+        self.path = path
+        self._count = count
+
+    def __len__(self):
+        if self._count is None:
+            with open(self.path, encoding="utf-8") as f:
+                self._count = sum(1 for line in f if line.strip())
+        return self._count
+
+    def __iter__(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def finalize_json(ndjson_path, json_path, sort_key=None):
+    """
+    Convert an NDJSON result file to the legacy indented JSON array.
+
+    Entries are streamed one at a time. With `sort_key`, only (key, file
+    offset) pairs are held in memory to put them in order.
+    """
+    tmp_path = json_path + ".tmp"
+    with open(ndjson_path, "rb") as source, open(tmp_path, "w", encoding="utf-8") as target:
+        offsets = []
+        while True:
+            offset = source.tell()
+            line = source.readline()
+            if not line:
+                break
+            if line.strip():
+                key = sort_key(json.loads(line)) if sort_key else None
+                offsets.append((key, offset))
+        if sort_key:
+            offsets.sort(key=lambda item: item[0])
+
+        # Same layout json.dump(entries, indent=2) produces
+        if not offsets:
+            target.write("[]")
+        for i, (_, offset) in enumerate(offsets):
+            source.seek(offset)
+            entry = json.loads(source.readline())
+            body = json.dumps(entry, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            target.write(("[\n  " if i == 0 else ",\n  ") + body)
+        if offsets:
+            target.write("\n]")
+    os.replace(tmp_path, json_path)
+    return json_path
@@ -0,0 +1,400 @@
+import importlib
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import cv2
+
+from ocr.layout import BoxLayout
+from ocr.ocr_cache import flush_cache
+from ocr.ocr_engine_2 import perform_ocr, extract_seq, extract_voterId_2, page_full_ocr
+from ocr.text_layer import needs_voter_id_ocr
+from ocr.epic import is_valid_epic
+from ocr.rasterizer import render_box
+from ocr.shm_pages import PageRing, box_ref, resolve
+from ocr import governor
+from ocr import profiling
+
+
+REQUIRED_FIELDS = ['Name', 'relation', 'relationName', 'houseNumber', 'Age']
+
+PAGE_TEXT = "page_text"
+
+
+def physical_cores():
+    """
+    Number of physical CPU cores, falling back to logical cores when unknown.
+    """
+    try:
+        import psutil
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    except ImportError:
+        pass
+
+    # Linux: count distinct (physical id, core id) pairs
+    try:
+        cores = set()
+        physical_id = None
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("physical id"):
+                    physical_id = line.split(":", 1)[1].strip()
+                elif line.startswith("core id"):
+                    cores.add((physical_id, line.split(":", 1)[1].strip()))
+        if cores:
+            return len(cores)
+    except OSError:
+        pass
+
+    return os.cpu_count() or 1
+
+
+def resolve_workers(max_workers=None):
+    if max_workers:
+        return max(1, int(max_workers))
+    return physical_cores()
+
+
+def box_result(sequenceOCR, result, trace=None):
+    return {
+        "sequenceOCR": sequenceOCR,
+        "result": result,
+        "is_empty": all(not result.get(field) for field in REQUIRED_FIELDS),
+        "trace": trace or {},
+    }
+
+
+def needs_second_pass(result):
+    """
+    A box read at low DPI that did not validate (no valid voter ID, non-numeric
+    age, no name) and is worth reading again at full resolution.
+    """
+    return (
+        not is_valid_epic(result.get("voterId") or "")
+        or not (result.get("Age") or "").isdigit()
+        or result.get("name") in (None, "", "Name Unavailable")
+    )
+
+
+def ocr_box(image, full_text=None, options=None, known=None):
+    """
+    Worker task: run the full extractor chain on a single voter box.
+    `options` carries per-roll hints from the parent (voter_id_configs,
+    epic_prefixes) and whether to profile; the worker's profile snapshot comes
+    back in the result.
+    `known` is a cell already read from the PDF's text layer (text_cells); only
+    its voter ID is OCR'd.
+    `image` may be a PageRef into a shared page instead of pixels.
+    """
+    image = resolve(image)
+    options = options or {}
+    trace = {}
+    profiling.enable(options.get("profile", False))
+
+    with profiling.stage("ocr_box"):
+        # Grayscale, blanked-out copy and field ROIs are computed once and shared
+        layout = BoxLayout(image)
+        if known is not None:
+            sequenceOCR = known["sequenceOCR"]
+            result = dict(known["result"])
+            result["voterId"] = extract_voterId_2(
+                image, layout,
+                configs=options.get("voter_id_configs"),
+                prefixes=options.get("epic_prefixes"),
+                trace=trace,
+            )
+        else:
+            sequenceOCR = extract_seq(image, layout)
+            result = perform_ocr(
+                image, layout,
+                full_text=full_text,
+                voter_id_configs=options.get("voter_id_configs"),
+                epic_prefixes=options.get("epic_prefixes"),
+                trace=trace,
+            )
+    profiling.count("boxes")
+    flush_cache()
+
+    task_result = box_result(sequenceOCR, result, trace)
+    task_result["profile"] = profiling.take()
+    return task_result
+
+
+def reread_box(pdf_path, page_num, row, col, size, dpi, poppler_path=None, options=None):
+    """
+    Worker task for the high-DPI second pass: render grid cell (row, col) of
+    the page at `dpi` (`size` is the full page at that DPI) and read it with
+    ocr_box. None when the render fails, so the low-DPI read is kept.
+    """
+    profiling.enable((options or {}).get("profile", False))
+    try:
+        image = render_box(pdf_path, page_num, row, col, size, dpi=dpi, poppler_path=poppler_path)
+    except (OSError, subprocess.CalledProcessError, RuntimeError) as e:
+        print(f"[WARNING] High-DPI render of page {page_num} failed, keeping the low-DPI read: {e}")
+        return None
+    profiling.count("second_pass_boxes")
+    task_result = ocr_box(image, None, options)
+    task_result["second_pass"] = True
+    return task_result
+
+
+def init_worker(semaphore, threads, settings=None):
+    """
+    ProcessPoolExecutor initializer: the Tesseract budget (governor.init_worker)
+    plus `settings`, {module name: {attribute: value}} set in the worker before
+    its first task, for overrides a spawned worker would not inherit.
+    """
+    governor.init_worker(semaphore, threads)
+    for module_name, values in (settings or {}).items():
+        module = importlib.import_module(module_name)
+        for name, value in values.items():
+            setattr(module, name, value)
+
+
+def ocr_page_text(page_gray, options=None):
+    """
+    Worker task for page_ocr mode: (texts per cell, profile snapshot).
+    `page_gray` may also be a PageRef to the shared BGR page.
+    """
+    profiling.enable((options or {}).get("profile", False))
+    page_gray = resolve(page_gray)
+    if page_gray.ndim == 3:
+        page_gray = cv2.cvtColor(page_gray, cv2.COLOR_BGR2GRAY)
+    texts = page_full_ocr(page_gray)
+    flush_cache()
+    return texts, profiling.take()
+
+
+class BoxScheduler:
+    """
+    Fans individual (page, box) tasks out to a process pool.
+
+    Idle workers pull the next box from the shared queue, so a slow page never
+    holds up the others. Finished pages are handed back in the order they were
+    submitted within their `group` (one group per PDF when several PDFs share
+    the pool), so one PDF's slow page does not hold back another's.
+    Worker profile snapshots go to `on_profile(page_key, snapshot)`, by default
+    the process's active profile.
+
+    With page_ocr=True the text of all boxes on a page is first read with one
+    page-level OCR task (page_full_ocr); the box tasks are queued once it is done
+    and skip their own full_ocr call.
+
+    Pages submitted with `second_pass` = (pdf_path, page_num, size, dpi,
+    poppler_path) get a second round once all their boxes are in: every box
+    that did not validate (needs_second_pass) is rendered again at `dpi` and
+    re-read by a reread_box task, and the page is only handed back when those
+    are done.
+
+    Pages read from the PDF's text layer are submitted with `known` cells:
+    those are finished without any OCR, except for voter IDs the text layer
+    did not give.
+
+    With `page_slots`, pages go through a ring of that many shared-memory
+    slots (share_page): box tasks carry a small PageRef instead of pickled
+    pixels. A page's slot is reused once the page has been handed back and
+    the caller asks for the next ones.
+
+    Every worker runs Tesseract with `tesseract_threads` OpenMP threads, and
+    no more Tesseract calls run at once than the core budget allows
+    (ocr.governor): max_workers is the outer split, tesseract_threads the inner.
+    `worker_settings` are module attributes overridden in every worker
+    (init_worker).
+    """
+
+    def __init__(self, max_workers=None, page_ocr=False, on_profile=None, page_slots=0, tesseract_threads=None,
+                 worker_settings=None):
+        self.max_workers = resolve_workers(max_workers)
+        self.page_ocr = page_ocr
+        self.on_profile = on_profile or (lambda page_key, snapshot: profiling.merge(snapshot))
+        self.ring = PageRing(page_slots) if page_slots else None
+        threads = tesseract_threads or governor.TESSERACT_THREADS
+        semaphore = governor.make_semaphore(self.max_workers, physical_cores(), threads)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=init_worker, initargs=(semaphore, threads, worker_settings)
+        )
+        self._futures = {}      # future -> (page_key, box index or PAGE_TEXT)
+        self._pages = {}        # page_key -> page record
+        self._order = []        # page keys in submission order
+        self._handed_out = []   # shared pages of the last batch returned by wait_pages
+
+    @property
+    def pages_in_flight(self):
+        return len(self._pages)
+
+    def share_page(self, image):
+        """
+        Copy a page into a free shared-memory slot. Returns (page, page_ref):
+        crop the boxes from the returned `page` and pass `page_ref` to
+        submit_page. page_ref is None when the page could not be shared.
+        """
+        if self.ring is None:
+            return image, None
+        return self.ring.put(image)
+
+    def release_page(self, page_ref):
+        if self.ring is not None:
+            self.ring.release(page_ref)
+
+    def submit_page(self, page_key, boxes, page_gray=None, options=None, known=None, group=None, page_ref=None,
+                    second_pass=None):
+        """
+        Queue every box of a page. `boxes` is the list from crop_10x3_grid;
+        `page_gray` is the grayscale page, needed in page_ocr mode unless the
+        page is shared (`page_ref` from share_page); `options` is passed to
+        every box task of the page. `known` holds the page's text-layer cells,
+        aligned with `boxes`. `second_pass` is how to render the page's boxes
+        again for the high-DPI re-read (see the class docstring).
+        """
+        self._pages[page_key] = {
+            "ref": page_ref,
+            "group": group,
+            "boxes": boxes,
+            "results": [None] * len(boxes),
+            "left": len(boxes),
+            "options": options,
+            "known": known,
+            "second_pass": second_pass,
+        }
+        self._order.append(page_key)
+
+        if page_ref is not None:
+            page_gray = page_ref
+        if self.page_ocr and boxes and page_gray is not None and known is None:
+            future = self.executor.submit(ocr_page_text, page_gray, options)
+            self._futures[future] = (page_key, PAGE_TEXT)
+        else:
+            self._submit_boxes(page_key)
+
+    def _submit_boxes(self, page_key, texts=None):
+        page = self._pages[page_key]
+        for i, box in enumerate(page["boxes"]):
+            known = page["known"][i] if page["known"] is not None else None
+            if known is not None and not needs_voter_id_ocr(known):
+                page["results"][i] = box_result(known["sequenceOCR"], dict(known["result"]))
+                page["left"] -= 1
+                continue
+
+            full_text = None
+            if texts is not None:
+                full_text = texts[(box["row"] - 1) * 3 + box["col"] - 1]
+            image = box["image"] if page["ref"] is None else box_ref(page["ref"], box["bounds"])
+            future = self.executor.submit(ocr_box, image, full_text, page["options"], known)
+            self._futures[future] = (page_key, i)
+
+    def _submit_second_pass(self, page_key):
+        """
+        Queue a reread_box task for every box of a finished page that did not
+        validate; the page waits for them.
+        """
+        page = self._pages[page_key]
+        pdf_path, page_num, size, dpi, poppler_path = page["second_pass"]
+        page["second_pass"] = None
+        for i, result in enumerate(page["results"]):
+            if not needs_second_pass(result["result"]):
+                continue
+            box = page["boxes"][i]
+            future = self.executor.submit(reread_box, pdf_path, page_num, box["row"], box["col"], size, dpi,
+                                          poppler_path, page["options"])
+            self._futures[future] = (page_key, i)
+            page["left"] += 1
+
+    def run_boxes(self, images, options=None):
+        """
+        OCR a few loose box images on the pool and wait for them, outside the
+        page bookkeeping.
+        """
+        futures = [self.executor.submit(ocr_box, image, None, options) for image in images]
+        results = []
+        for future in futures:
+            result = future.result()
+            profiling.merge(result.pop("profile", None))
+            results.append(result)
+        return results
+
+    def _ready_pages(self):
+        ready = []
+        blocked = set()
+        for page_key in list(self._order):
+            page = self._pages[page_key]
+            if page["group"] in blocked:
+                continue
+            if page["left"]:
+                blocked.add(page["group"])
+                continue
+            self._order.remove(page_key)
+            del self._pages[page_key]
+            if page["ref"] is not None:
+                self._handed_out.append(page["ref"])
+            ready.append((page_key, page["boxes"], page["results"]))
+        return ready
+
+    def _result(self, future, page_key):
+        """
+        A task's result; a task that crashed comes back as an empty box, so one
+        bad box stops its page early instead of the whole run.
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"[ERROR] OCR task for page {page_key} failed: {e}")
+            return None
+
+    def wait_pages(self):
+        """
+        Block until at least one box finishes and return the pages that are now
+        complete, in submission order (possibly an empty list).
+        The shared pages of the previous batch are recycled here, so the caller
+        must be done with those boxes before asking for more.
+        """
+        for page_ref in self._handed_out:
+            self.release_page(page_ref)
+        self._handed_out = []
+
+        ready = self._ready_pages()
+        if ready or not self._futures:
+            return ready
+
+        done, _ = wait(list(self._futures), return_when=FIRST_COMPLETED)
+        for future in done:
+            page_key, i = self._futures.pop(future)
+            result = self._result(future, page_key)
+            if i == PAGE_TEXT:
+                # Without the page text every box simply runs its own full_ocr
+                texts, snapshot = result if result is not None else (None, None)
+                self.on_profile(page_key, snapshot)
+                self._submit_boxes(page_key, texts)
+                continue
+            page = self._pages[page_key]
+            if result is not None:
+                self.on_profile(page_key, result.pop("profile", None))
+                page["results"][i] = result
+            elif page["results"][i] is None:
+                # (a failed re-read keeps the first pass's result)
+                page["results"][i] = box_result("", {})
+            page["left"] -= 1
+            if not page["left"] and page["second_pass"] is not None:
+                self._submit_second_pass(page_key)
+
+        return self._ready_pages()
+
+    def completed_pages(self):
+        """
+        Yield (page_key, boxes, results) for every submitted page, in order.
+        """
+        while self._pages:
+            for page in self.wait_pages():
+                yield page
+
+    def shutdown(self, cancel=False):
+        self.executor.shutdown(wait=True, cancel_futures=cancel)
+        if self.ring is not None:
+            self.ring.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(cancel=exc_type is not None)
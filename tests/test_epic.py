@@ -0,0 +1,24 @@
+from ocr.epic import EpicPrefixModel, repair_epic
+
+
+CONFIDENT = [99] * 10
+
+
+def test_early_misread_prefix_is_still_repaired():
+    model = EpicPrefixModel()
+    # The first box of the roll is misread; the worker could not repair it yet
+    model.record("LBG1234567", [70, 98, 98] + [99] * 7)
+    for n in range(30):
+        model.record(f"IBG{n:07d}", CONFIDENT)
+    # A few confident misreads are OCR noise, not a prefix of the roll
+    for n in range(3):
+        model.record(f"LBG{n:07d}", CONFIDENT)
+
+    assert model.dominant() == ["IBG"]
+    assert repair_epic("LBG1234567", prefixes=model.dominant()) == "IBG1234567"
+
+
+def test_repaired_ids_are_not_learned():
+    model = EpicPrefixModel(min_samples=1)
+    model.record("IBG1234567", CONFIDENT, repaired=True)
+    assert model.dominant() == []
@@ -0,0 +1,20 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from ocr import governor
+
+
+pytestmark = pytest.mark.skipif(governor.openmp_threads() is None, reason="libgomp not available")
+
+
+def test_forked_worker_gets_its_thread_limit():
+    # The parent's OpenMP runtime is loaded and set up before the pool forks
+    governor.set_openmp_threads(3)
+    assert governor.openmp_threads() == 3
+
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context,
+                             initializer=governor.init_worker, initargs=(None, 2)) as pool:
+        assert pool.submit(governor.openmp_threads).result() == 2